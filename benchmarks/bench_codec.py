@@ -0,0 +1,61 @@
+"""
+Measures how many message:create events per second can be decoded
+from their wire format and parsed into models, for every installed
+JSON codec.
+
+    python -m benchmarks.bench_codec [events]
+"""
+import sys
+import time
+
+from typing import Any, Dict
+
+from veldpy import models
+from veldpy.codec import JSONCodec, available_codecs
+
+EVENTS = 100_000
+
+
+def message(id: int) -> Dict[str, Any]:
+    def user(id: int) -> Dict[str, Any]:
+        return {
+            "id": id,
+            "name": f"user{id}",
+            "bot": False,
+            "status": {"value": "online", "statusText": "hello"},
+            "avatarUrl": f"https://cdn.veld.dev/avatars/{id}.png",
+        }
+
+    return {
+        "id": id,
+        "content": "some message content " * 4,
+        "user": user(id % 50),
+        "channel": {"id": 1, "name": "general"},
+        "mentions": [user(1), user(2)],
+        "embed": {
+            "author": {"value": "author", "iconUrl": "https://veld.dev/icon.png"},
+            "title": "title",
+            "description": "description " * 8,
+            "color": 0xFF00FF,
+        },
+    }
+
+
+def measure(codec: JSONCodec, events: int) -> float:
+    raw = [codec.dumps(message(i)) for i in range(events)]
+    loads = codec.loads
+    start = time.perf_counter()
+    for payload in raw:
+        models.Message.from_dict(loads(payload))
+    return events / (time.perf_counter() - start)
+
+
+def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else EVENTS
+    for name, codec in available_codecs().items():
+        rate = measure(codec, events)
+        print(f"{name:>6}: {rate:10.0f} events per second")
+
+
+if __name__ == "__main__":
+    main()
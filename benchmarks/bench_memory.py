@@ -0,0 +1,86 @@
+"""
+Measures the memory used per model object for a synthetic ready payload.
+
+Compares the slotted models in veldpy.models with plain dataclass
+replicas that keep a per-instance __dict__.
+
+    python -m benchmarks.bench_memory [members]
+"""
+import dataclasses
+import gc
+import sys
+import tracemalloc
+
+from typing import Any, Callable, Dict, List, Type
+
+from veldpy import models
+
+MEMBERS = 100_000
+
+
+def ready_payload(members: int) -> Dict[str, Any]:
+    def user(id: int) -> Dict[str, Any]:
+        return {
+            "id": id,
+            "name": f"user{id}",
+            "bot": id % 10 == 0,
+            "status": {"value": "online" if id % 3 else "away"},
+            "avatarUrl": None,
+        }
+
+    return {
+        "user": user(0),
+        "members": [user(i) for i in range(1, members + 1)],
+        "token": "token",
+    }
+
+
+def unslotted(cls: Type[Any]) -> Type[Any]:
+    """Builds a dataclass with the same fields as cls but without __slots__."""
+    return dataclasses.make_dataclass(
+        cls.__name__,
+        [(f.name, f.type, f) for f in dataclasses.fields(cls)],
+        eq=True,
+    )
+
+
+def parse_unslotted(data: Dict[str, Any]) -> List[Any]:
+    user_cls = unslotted(models.User)
+    status_cls = unslotted(models.UserStatus)
+    return [
+        user_cls(
+            id=int(d["id"]),
+            name=d["name"],
+            bot=d["bot"],
+            status=status_cls(value=models.Status[d["status"]["value"].upper()]),
+            avatar_url=d.get("avatarUrl", None),
+        )
+        for d in data["members"]
+    ]
+
+
+def parse_slotted(data: Dict[str, Any]) -> List[Any]:
+    return models.ReadyPayload.from_dict(data).members
+
+
+def measure(parse: Callable[[Dict[str, Any]], List[Any]], data: Dict[str, Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = parse(data)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main() -> None:
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else MEMBERS
+    data = ready_payload(members)
+    for name, parse in (("dict", parse_unslotted), ("slots", parse_slotted)):
+        used = measure(parse, data)
+        print(f"{name:>6}: {used / members:7.1f} bytes per member ({used} total)")
+
+
+if __name__ == "__main__":
+    main()
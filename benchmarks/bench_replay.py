@@ -0,0 +1,180 @@
+"""
+Replays a gateway event stream through Client.dispatch without a network
+connection and reports throughput, latency until the handler returned and
+peak memory.
+
+The stream is either generated or read from a file with one JSON object
+per line, {"event": "message:create", "data": {...}}.
+
+    python -m benchmarks.bench_replay [--events N] [--members N] [--lazy]
+    python -m benchmarks.bench_replay --save stream.jsonl
+    python -m benchmarks.bench_replay --replay stream.jsonl
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from veldpy import Client, GatewayEvent
+
+Stream = List[Tuple[GatewayEvent, Optional[Dict[str, Any]]]]
+
+CHANNELS = 20
+
+
+def user(id: int) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "name": f"user{id}",
+        "bot": id % 10 == 0,
+        "status": {"value": "online" if id % 3 else "away"},
+        "avatarUrl": f"https://cdn.veld.dev/avatars/{id}.png",
+    }
+
+
+def channel(id: int, members: int = 0) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "name": f"channel{id}",
+        "members": [user(i) for i in range(1, members + 1)],
+    }
+
+
+def synthetic(events: int, members: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    A ready payload with a large member list, channel creations and then
+    mostly messages mixed with members joining and leaving.
+    """
+    yield "ready", {
+        "user": user(0),
+        "members": [user(i) for i in range(1, members + 1)],
+        "token": "token",
+    }
+    for id in range(1, CHANNELS + 1):
+        yield "channel:create", channel(id, min(members, 50))
+    for i in range(events):
+        author = user(i % members + 1)
+        target = channel(i % CHANNELS + 1)
+        if i % 20 == 0:
+            yield "member:create", {"channel": target, "user": user(members + i)}
+        elif i % 20 == 10:
+            yield "member:delete", {"channel": target, "user": user(members + i - 10)}
+        elif i % 20 == 5:
+            yield "user:typing", author
+        else:
+            message: Dict[str, Any] = {
+                "id": i,
+                "content": f"message {i}",
+                "user": author,
+                "channel": target,
+                "mentions": [user(i % members + 2)] if i % 4 == 0 else [],
+            }
+            if i % 8 == 0:
+                message["embed"] = {
+                    "author": {"value": "bot", "iconUrl": "https://veld.dev/i.png"},
+                    "title": "title",
+                    "description": "description",
+                }
+            yield "message:create", message
+
+
+def load(path: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["event"], record["data"]
+
+
+def save(path: str, stream: Iterator[Tuple[str, Dict[str, Any]]]) -> None:
+    with open(path, "w") as f:
+        for event, data in stream:
+            f.write(json.dumps({"event": event, "data": data}) + "\n")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def _replay(
+    stream: Stream, lazy: bool, latencies: Optional[List[float]] = None
+) -> float:
+    """Replays the stream once and returns how long it took."""
+    client = Client(lazy_models=lazy)
+    started = 0.0
+
+    async def listener(*args: Any) -> None:
+        try:
+            # Touch what a typical bot reads
+            if args and hasattr(args[0], "content"):
+                args[0].user.name
+        finally:
+            if latencies is not None:
+                latencies.append(time.perf_counter() - started)
+
+    for event in GatewayEvent:
+        if event is not GatewayEvent.CONNECT:
+            client.add_listener(event, listener)
+
+    start = time.perf_counter()
+    for event, data in stream:
+        started = time.perf_counter()
+        client.dispatch(event, data)
+        # Lets the listener task run before the next event
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return elapsed
+
+
+async def replay(stream: Stream, lazy: bool) -> Dict[str, float]:
+    """
+    Measures throughput and the latency from dispatching an event until its
+    handler returned, then peak memory in a second pass, as tracing every
+    allocation slows the first one down.
+    """
+    latencies: List[float] = []
+    elapsed = await _replay(stream, lazy, latencies)
+    tracemalloc.start()
+    try:
+        await _replay(stream, lazy)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "events": len(stream),
+        "rate": len(stream) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "peak": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--members", type=int, default=10_000)
+    parser.add_argument("--lazy", action="store_true", help="use lazy models")
+    parser.add_argument("--replay", help="read the stream from a file")
+    parser.add_argument("--save", help="write the synthetic stream to a file")
+    args = parser.parse_args()
+
+    if args.save:
+        save(args.save, synthetic(args.events, args.members))
+        return
+    raw = load(args.replay) if args.replay else synthetic(args.events, args.members)
+    stream: Stream = [(GatewayEvent(event), data) for event, data in raw]
+    result = asyncio.run(replay(stream, args.lazy))
+    print(
+        f"{result['events']:.0f} events, {result['rate']:.0f} events per second\n"
+        f"handler latency p50 {result['p50'] * 1e6:.1f}µs, p99 {result['p99'] * 1e6:.1f}µs\n"
+        f"peak memory {result['peak'] / 2 ** 20:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
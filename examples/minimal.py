@@ -36,13 +36,12 @@ async def on_channel_join(channel: Channel):
     )
 
 
-@client.event()
+# Messages by bots or without the prefix are skipped before they are parsed
+@client.event(bot=False, prefix=".")
 async def on_message_create(message: Message) -> None:
-    if message.user.bot or not message.content:
-        return
     if message.content == ".ping":
         await client.http.send_message(message.channel.id, "poggers")
-    elif message.content.startswith("."):
+    else:
         await client.http.send_message(message.channel.id, "idk that command bro")
 
 
@@ -0,0 +1,57 @@
+import socket
+
+from typing import Any, Dict
+
+from veldpy import models
+
+# Factories for the raw gateway payloads and models the tests are built on.
+
+
+def user_data(
+    id: int, status: str = "online", bot: bool = False, name: str = ""
+) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "name": name or f"user{id}",
+        "bot": bot,
+        "status": {"value": status},
+    }
+
+
+def message_data(
+    content: str = "hi",
+    id: int = 1,
+    user: int = 2,
+    bot: bool = False,
+    channel: int = 1,
+) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "content": content,
+        "user": user_data(user, bot=bot),
+        "channel": {"id": channel, "name": "general"},
+        "mentions": [],
+    }
+
+
+def make_user(id: int, **fields: Any) -> models.User:
+    fields.setdefault("name", f"user{id}")
+    fields.setdefault("bot", False)
+    fields.setdefault("status", models.UserStatus(value=models.Status.ONLINE))
+    return models.User(id=id, **fields)
+
+
+def make_message(id: int, channel: int = 1) -> models.Message:
+    return models.Message(
+        id=id,
+        user=make_user(1),
+        channel=models.Channel(id=channel, name="general"),
+        mentions=[],
+        content=str(id),
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
@@ -0,0 +1,71 @@
+import asyncio
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from veldpy import models
+from veldpy.batching import MessageBatcher
+from veldpy.http import HTTPClient, HTTPException
+
+
+def make_http() -> Tuple[HTTPClient, List[Tuple[str, Dict[str, Any]]]]:
+    http = HTTPClient()
+    sent: List[Tuple[str, Dict[str, Any]]] = []
+
+    async def request(
+        method: str, route: str, expected_status: int = 200, **kwargs: Any
+    ) -> None:
+        await asyncio.sleep(0)
+        json: Optional[Dict[str, Any]] = kwargs.get("json")
+        assert json is not None
+        if json["content"] == "fail":
+            raise HTTPException(500, "Internal Server Error")
+        sent.append((route, json))
+
+    http.request = request  # type: ignore
+    return http, sent
+
+
+def test_coalescing() -> None:
+    async def run() -> None:
+        http, sent = make_http()
+        batcher = MessageBatcher(http, window=0.01, max_messages=3)
+        first = batcher.send(1, "a")
+        batcher.send(2, "x")
+        batcher.send(1, "b")
+        batcher.send(1, "c")
+        fourth = batcher.send(1, "d")
+        embed = batcher.send(1, embed=models.Embed(title="t"))
+        assert batcher.pending == 1
+        assert await first is True
+        assert await fourth is True
+        assert await embed is True
+        await asyncio.sleep(0.02)
+        assert sent[:3] == [
+            ("/channels/1/messages", {"content": "a\nb\nc"}),
+            ("/channels/1/messages", {"content": "d"}),
+            (
+                "/channels/1/messages",
+                {"content": None, "embed": models.Embed(title="t").to_dict()},
+            ),
+        ]
+        assert sent[3] == ("/channels/2/messages", {"content": "x"})
+        assert batcher.pending == 0
+
+    asyncio.run(run())
+
+
+def test_failure() -> None:
+    async def run() -> None:
+        http, sent = make_http()
+        batcher = MessageBatcher(http, max_length=4)
+        future = batcher.send(1, "fail")
+        ok = batcher.send(1, "ok")
+        batcher.flush()
+        with pytest.raises(HTTPException):
+            await future
+        assert await ok is True
+        assert sent == [("/channels/1/messages", {"content": "ok"})]
+
+    asyncio.run(run())
@@ -0,0 +1,14 @@
+import asyncio
+
+from veldpy import GatewayEvent
+
+from benchmarks import bench_replay
+
+
+def test_replay() -> None:
+    raw = bench_replay.synthetic(events=200, members=20)
+    stream = [(GatewayEvent(event), data) for event, data in raw]
+    for lazy in (False, True):
+        result = asyncio.run(bench_replay.replay(stream, lazy))
+        assert result["events"] == 221
+        assert result["p50"] <= result["p99"]
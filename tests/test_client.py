@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+from typing import List
+
+import pytest
+
+from veldpy import Channel, Client, Dispatcher, DispatchPolicy, GatewayEvent
+
+from .helpers import user_data
+
+
+def test_thread_executor() -> None:
+    async def run() -> None:
+        client = Client(thread_workers=1)
+        threads: List[str] = []
+
+        @client.event(GatewayEvent.CONNECT, executor="thread")
+        def on_connect() -> None:
+            threads.append(threading.current_thread().name)
+
+        client._listeners[GatewayEvent.CONNECT].remove(client.on_connect)
+        client.dispatch(GatewayEvent.CONNECT)
+        while client._tasks:
+            await asyncio.sleep(0.001)
+        assert threads and threads[0] != threading.current_thread().name
+        assert client._thread_pool is not None
+        client._thread_pool.shutdown()
+
+    asyncio.run(run())
+
+
+def test_unknown_executor() -> None:
+    async def run() -> None:
+        with pytest.raises(ValueError):
+            Client().add_listener(GatewayEvent.CONNECT, print, executor="fiber")
+
+    asyncio.run(run())
+
+
+def test_reconnect_reconciles() -> None:
+    async def run() -> None:
+        client = Client()
+        ready = {
+            "user": user_data(0),
+            "members": [user_data(1), user_data(2)],
+            "token": "t",
+        }
+        channel = {"id": 1, "name": "general", "members": [user_data(1), user_data(2)]}
+        client.dispatch(GatewayEvent.READY, ready)
+        client.dispatch(GatewayEvent.CHANNEL_CREATE, channel)
+        client.dispatch(GatewayEvent.DISCONNECT)
+        assert client.http._paused
+
+        client.dispatch(GatewayEvent.READY, {**ready, "members": [user_data(2)]})
+        assert not client.http._paused
+        assert list(client.state.get_member_ids(1)) == [2]
+        await client.close()
+
+    asyncio.run(run())
+
+
+def test_socketio_handlers() -> None:
+    async def run() -> None:
+        # Keeps only the newest job until the worker starts
+        dispatcher = Dispatcher(DispatchPolicy(workers=1, max_queue=1))
+        for client in (Client(), Client(dispatcher=dispatcher)):
+            created: List[int] = []
+
+            @client.event(GatewayEvent.CHANNEL_CREATE)
+            async def on_channel_create(channel: Channel) -> None:
+                created.append(channel.id)
+
+            # The path socket.io takes for every received packet
+            for id in range(3):
+                await client.sio._trigger_event(
+                    "channel:create", "/", {"id": id, "name": "general"}
+                )
+            await asyncio.sleep(0.01)
+            assert client.get_channel(2) is not None
+            assert created == ([0, 1, 2] if client.dispatcher is None else [2])
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+import asyncio
+
+from typing import List
+
+from veldpy import Client, GatewayEvent, models
+from veldpy.coalesce import Coalescer
+
+from .helpers import user_data
+
+
+def test_window() -> None:
+    now = 0.0
+    coalescer = Coalescer(1.0, clock=lambda: now)
+    assert coalescer({"id": 1})
+    assert not coalescer({"id": 1})
+    assert coalescer({"id": 2})
+    now = 0.5
+    assert not coalescer({"id": 1})
+    now = 1.0
+    assert coalescer({"id": 1})
+    # User 2 was not seen for a window and is forgotten
+    now = 2.5
+    assert coalescer({"id": 3})
+    assert len(coalescer) == 1
+
+
+def test_client_typing_window() -> None:
+    async def run() -> None:
+        client = Client(typing_window=60.0)
+        typing: List[models.User] = []
+        client.add_listener(GatewayEvent.MEMBER_TYPING, typing.append)
+        for _ in range(3):
+            client.dispatch(GatewayEvent.MEMBER_TYPING, user_data(1))
+        client.dispatch(GatewayEvent.MEMBER_TYPING, user_data(2))
+        assert [u.id for u in typing] == [1, 2]
+
+    asyncio.run(run())
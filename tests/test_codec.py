@@ -0,0 +1,27 @@
+import pytest
+
+from veldpy.codec import JSONCodec, _stdlib, available_codecs, get_codec
+
+
+def test_codecs() -> None:
+    data = {"id": 1, "content": "äöü", "mentions": [], "embed": None}
+    for codec in available_codecs().values():
+        encoded = codec.dumps(data, separators=(",", ":"))
+        assert isinstance(encoded, str)
+        assert codec.loads(encoded) == data
+        assert get_codec(codec) is codec
+
+
+def test_get_codec() -> None:
+    assert get_codec("json").name == "json"
+    assert get_codec().name in available_codecs()
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+def test_get_codec_is_lazy(monkeypatch: pytest.MonkeyPatch) -> None:
+    def broken() -> JSONCodec:
+        raise AssertionError("built a codec that is not used")
+
+    monkeypatch.setattr("veldpy.codec._codecs", {"json": _stdlib, "broken": broken})
+    assert get_codec().name == "json"
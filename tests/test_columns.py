@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from veldpy import Client, GatewayEvent, MemberStore, columns
+from veldpy.columns import MemberView, UserColumns
+from veldpy.models import Status
+
+from .helpers import user_data
+
+
+def test_query() -> None:
+    store = MemberStore()
+    store.set_channel(
+        1,
+        [
+            user_data(1),
+            user_data(2, "offline"),
+            user_data(3, bot=True),
+            user_data(4, "dnd"),
+        ],
+    )
+    store.set_channel(2, [user_data(1), user_data(5)])
+    assert len(store) == 5
+    assert store.query(1, Status.ONLINE, bot=False) == [1]
+    assert store.query(1, bot=True) == [3]
+    assert store.query(2) == [1, 5]
+    assert store.query(status=Status.ONLINE) == [1, 3, 5]
+
+    # Updates are seen by every channel of the user
+    store.add(user_data(1, "away"))
+    assert store.query(2, Status.ONLINE) == [5]
+    view = store.get_user(1)
+    assert view is not None and view.status.value is Status.AWAY
+
+    store.remove_member(2, 5)
+    assert store.query(2) == [1]
+    store.reconcile([0, 1])
+    assert store.query(1) == [1]
+    store.remove_channel(1)
+    assert store.member_count(1) == 0
+
+
+def test_query_numpy(monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("numpy")
+    store = MemberStore()
+    statuses = ["online", "offline", "dnd", "away"]
+    store.set_channel(
+        1, [user_data(id, statuses[id % 4], bot=id % 3 == 0) for id in range(100)]
+    )
+    store.add(user_data(100))
+    queries = [(1, Status.ONLINE, False), (1, None, True), (None, Status.AWAY, None)]
+    results = [store.query(*query) for query in queries]
+    assert results[0] == [id for id in range(0, 100, 4) if id % 3]
+    assert 100 in store.query()
+
+    monkeypatch.setattr(columns, "_HAS_NUMPY", False)
+    assert [store.query(*query) for query in queries] == results
+
+
+def test_eviction() -> None:
+    store = MemberStore(max_users=2)
+    store.set_channel(1, [user_data(1), user_data(2), user_data(3)])
+    for id in range(10, 15):
+        store.add(user_data(id))
+    # Channel members are kept, of the others only the two newest
+    assert sorted(store.query()) == [1, 2, 3, 13, 14]
+    store.remove_channel(1)
+    assert sorted(store.query()) == [2, 3]
+    # Rows of evicted users are reused
+    store.add(user_data(20))
+    assert len(store.columns.ids) == 6
+    assert store.get_user(20) is not None and 2 not in store
+
+
+def test_shared_columns() -> None:
+    columns = UserColumns()
+    first, second = MemberStore(columns), MemberStore(columns)
+    first.set_channel(1, [user_data(1)])
+    second.set_channel(2, [user_data(1), user_data(2)])
+    assert first.query(2) == []
+    first.remove_channel(1)
+    assert second.query(2) == [1, 2]
+    assert first.get_user(2) is not None
+
+
+def test_client_member_store() -> None:
+    async def run() -> None:
+        client = Client(member_store=MemberStore())
+        client.dispatch(
+            GatewayEvent.READY,
+            {
+                "user": user_data(10, bot=True),
+                "members": [user_data(1), user_data(2)],
+                "token": "t",
+            },
+        )
+        client.dispatch(
+            GatewayEvent.CHANNEL_CREATE,
+            {"id": 7, "name": "general", "members": [user_data(1), user_data(3)]},
+        )
+        channel = client.get_channel(7)
+        assert channel is not None and channel.members == []
+        store = client.member_store
+        assert store is not None
+        assert store.query(7) == [1, 3]
+        user2 = client.get_user(2)
+        assert user2 is not None and user2.name == "user2"
+
+        client.dispatch(
+            GatewayEvent.MEMBER_CREATE,
+            {"channel": {"id": 7, "name": "general"}, "user": user_data(2)},
+        )
+        client.dispatch(
+            GatewayEvent.MEMBER_DELETE,
+            {"channel": {"id": 7, "name": "general"}, "user": user_data(1)},
+        )
+        assert store.query(7) == [2, 3]
+
+        client.dispatch(
+            GatewayEvent.CHANNEL_DELETE,
+            {"id": 7, "name": "general", "members": [user_data(4)]},
+        )
+        assert store.member_count(7) == 0
+        assert client.get_channel(7) is None
+        assert 4 not in store and client.state.get_user(4) is None
+
+    asyncio.run(run())
+
+
+def test_member_view() -> None:
+    view = MemberView([user_data(i) for i in range(3)])
+    assert [u.id for u in view] == [0, 1, 2]
+    assert view[-1].name == "user2"
+    assert len(view[1:]) == 2
+    assert list(view.ids()) == [0, 1, 2]
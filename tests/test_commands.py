@@ -0,0 +1,72 @@
+import asyncio
+
+from typing import Any, List
+
+import pytest
+
+from veldpy import Client, GatewayEvent
+from veldpy.ext.commands import BucketType, CommandError, Context, Cooldown, Router
+
+from .helpers import message_data
+
+
+def test_router() -> None:
+    async def run() -> None:
+        client = Client()
+        router = Router(client, prefix=["!", "!!", "?"], case_insensitive=True)
+        calls: List[Any] = []
+        errors: List[Exception] = []
+
+        async def on_command_error(ctx: Context, exc: Exception) -> None:
+            errors.append(exc)
+
+        router.on_command_error = on_command_error  # type: ignore
+
+        @router.command(aliases=["sum"])
+        async def add(ctx: Context, a: int, b: int = 1, *, note: str = "") -> None:
+            calls.append((ctx.prefix, ctx.invoked_with, a, b, note))
+
+        @router.command(cooldown=Cooldown(1, 60, BucketType.USER))
+        async def slow(ctx: Context, *words: str) -> None:
+            calls.append(words)
+
+        for content in (
+            "!add 1 2 three four",
+            "!!SUM 5",
+            "?nope 1",
+            "!add x",
+            "hello",
+            "!slow a b",
+            "!slow c",
+        ):
+            client.dispatch(GatewayEvent.MESSAGE_CREATE, message_data(content))
+        while client._tasks:
+            await asyncio.sleep(0.001)
+
+        assert calls == [
+            ("!", "add", 1, 2, "three four"),
+            ("!!", "sum", 5, 1, ""),
+            ("a", "b"),
+        ]
+        assert [type(e).__name__ for e in errors] == [
+            "BadArgument",
+            "CommandOnCooldown",
+        ]
+        assert all(isinstance(e, CommandError) for e in errors)
+
+    asyncio.run(run())
+
+
+def test_duplicate_command() -> None:
+    async def run() -> None:
+        router = Router(Client(), prefix="!")
+
+        @router.command()
+        async def ping(ctx: Context) -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            router.command(name="ping")(ping.callback)
+        assert ping.parse("extra words") == ([], {})
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+import asyncio
+
+from typing import Any, List
+
+from veldpy.dispatcher import Dispatcher, DispatchPolicy, Overflow, QueueFull
+from veldpy.events import GatewayEvent
+
+EVENT = GatewayEvent.MESSAGE_CREATE
+
+
+def test_bounded_workers() -> None:
+    async def run() -> None:
+        running = 0
+        peak = 0
+        seen: List[int] = []
+
+        async def listener(i: int) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            seen.append(i)
+
+        dispatcher = Dispatcher(DispatchPolicy(workers=2, max_queue=100))
+        for i in range(20):
+            assert dispatcher.submit(EVENT, [listener], (i,)) is None
+        assert dispatcher.pending == 20
+        await asyncio.sleep(0)
+        assert dispatcher.pending == 18
+        while dispatcher.running:
+            await asyncio.sleep(0.001)
+        assert peak == 2
+        assert sorted(seen) == list(range(20))
+
+    asyncio.run(run())
+
+
+def test_overflow() -> None:
+    async def run() -> None:
+        errors: List[BaseException] = []
+        seen: List[Any] = []
+
+        async def listener(i: int) -> None:
+            seen.append(i)
+
+        def broken(i: int) -> None:
+            raise ValueError(i)
+
+        for overflow, expected in (
+            (Overflow.DROP_OLDEST, [3, 4]),
+            (Overflow.REJECT, [0, 1]),
+        ):
+            seen.clear()
+            errors.clear()
+            dispatcher = Dispatcher(
+                policies={EVENT: DispatchPolicy(1, 2, overflow)},
+                on_error=lambda event, exc: errors.append(exc),
+            )
+            for i in range(5):
+                dispatcher.submit(EVENT, [listener], (i,))
+            await asyncio.sleep(0.01)
+            assert seen == expected
+            assert len(errors) == 5 - len(expected)
+            assert all(isinstance(e, QueueFull) for e in errors)
+
+        dispatcher.submit(EVENT, [broken], (1,))
+        assert isinstance(errors[-1], ValueError)
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+import asyncio
+
+from typing import Any, Dict, List
+
+import pytest
+
+from veldpy import Client, GatewayEvent
+from veldpy.filters import make_filter
+
+from .helpers import message_data
+
+
+def test_make_filter() -> None:
+    event = GatewayEvent.MESSAGE_CREATE
+    assert make_filter(event) is None
+    check = make_filter(event, bot=False, prefix=("!", "."), channels=[1, 2])
+    assert check is not None
+    assert check(message_data("!ping"))
+    assert check(message_data(".ping", channel=2))
+    assert not check(message_data("ping"))
+    assert not check(message_data("!ping", bot=True))
+    assert not check(message_data("!ping", channel=3))
+
+    with pytest.raises(ValueError):
+        make_filter(GatewayEvent.MEMBER_TYPING, prefix="!")
+    with pytest.raises(ValueError):
+        make_filter(GatewayEvent.CHANNEL_CREATE, bot=True)
+
+
+def test_skips_parsing() -> None:
+    async def run() -> None:
+        client = Client()
+        seen: List[Any] = []
+        parsed: List[Any] = []
+        parser = client._parsers[GatewayEvent.MESSAGE_CREATE]
+
+        def counting_parser(data: Dict[str, Any]) -> Any:
+            parsed.append(data)
+            return parser(data)
+
+        client._parsers[GatewayEvent.MESSAGE_CREATE] = counting_parser
+        client.event(GatewayEvent.MESSAGE_CREATE, bot=False, prefix="!")(seen.append)
+        client.dispatch(GatewayEvent.MESSAGE_CREATE, message_data("hello"))
+        client.dispatch(GatewayEvent.MESSAGE_CREATE, message_data("!hello", bot=True))
+        assert parsed == [] and seen == []
+        client.dispatch(GatewayEvent.MESSAGE_CREATE, message_data("!hello"))
+        assert len(parsed) == 1
+        assert seen[0].content == "!hello"
+
+    asyncio.run(run())
+
+
+def test_malformed_data() -> None:
+    async def run() -> None:
+        client = Client()
+        errors: List[BaseException] = []
+        client.on_error = lambda event, exc: errors.append(exc)  # type: ignore
+        seen: List[Any] = []
+        client.event(GatewayEvent.MESSAGE_CREATE, bot=False)(seen.append)
+        data = message_data("hi")
+        del data["user"]
+        client.dispatch(GatewayEvent.MESSAGE_CREATE, data)
+        assert seen == []
+        assert isinstance(errors[0], KeyError)
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+
+from veldpy import Client, GatewayEvent
+from veldpy.history import MessageHistory
+from veldpy.lazy import LazyMessage
+
+from .helpers import make_message, message_data
+
+
+def test_bounds() -> None:
+    history = MessageHistory(per_channel=3, max_messages=5)
+    for i in range(5):
+        history.add(make_message(i, 1))
+    assert [m.id for m in history.channel(1)] == [2, 3, 4]
+    assert history.get(1) is None
+    assert history.get(4) is not None
+
+    for i in range(5, 8):
+        history.add(make_message(i, 2))
+    # The oldest message of channel 1 is dropped for the global limit
+    assert len(history) == 5
+    assert [m.id for m in history.channel(1)] == [3, 4]
+    assert [m.id for m in history.channel(2, limit=2)] == [6, 7]
+
+    assert history.remove(3) is not None
+    history.remove_channel(2)
+    assert [m.id for m in history.channel(1)] == [4]
+    assert len(history) == 1
+
+
+def test_client_history() -> None:
+    async def run() -> None:
+        client = Client(history=MessageHistory())
+        data = message_data("hi", id=9, channel=3)
+        client.dispatch(GatewayEvent.MESSAGE_CREATE, data)
+        message = client.get_message(9)
+        assert message is not None and message.content == "hi"
+        client.dispatch(GatewayEvent.CHANNEL_DELETE, {"id": 3, "name": "general"})
+        assert client.get_message(9) is None
+
+    asyncio.run(run())
+
+
+def test_lazy_messages() -> None:
+    history = MessageHistory()
+    message = LazyMessage.from_dict(message_data("hi", channel=3))
+    history.add(message)
+    assert isinstance(message, LazyMessage) and message._data == {}
+    assert message.user.id == 2 and message.channel.id == 3
@@ -0,0 +1,146 @@
+import asyncio
+
+from typing import Any, List
+
+import aiohttp
+import pytest
+
+from aiohttp import web
+
+from veldpy.http import BufferFull, ConnectionLost, HTTPClient, HTTPException
+from veldpy.ratelimit import RateLimiter
+
+
+def test_lazy_session() -> None:
+    http = HTTPClient(base_url="http://localhost:8080/api/v1/", limit=10)
+    assert http._session is None
+    assert http.base_url == "http://localhost:8080/api/v1"
+
+
+def test_pause() -> None:
+    async def run() -> None:
+        http = HTTPClient(max_buffered=1)
+        http.pause()
+        waiter = asyncio.ensure_future(http._wait_until_resumed())
+        await asyncio.sleep(0)
+        assert http.buffered == 1
+        with pytest.raises(BufferFull):
+            await http._wait_until_resumed()
+        http.resume()
+        await waiter
+        assert http.buffered == 0
+
+    asyncio.run(run())
+
+
+def test_buffered_requests_fail() -> None:
+    async def run() -> None:
+        http = HTTPClient(buffer_timeout=0.01)
+        http.pause()
+        with pytest.raises(ConnectionLost):
+            await http._wait_until_resumed()
+        http.buffer_timeout = None
+        waiter = asyncio.ensure_future(http._wait_until_resumed())
+        await asyncio.sleep(0)
+        await http.close()
+        with pytest.raises(ConnectionLost):
+            await waiter
+        assert http.buffered == 0
+
+    asyncio.run(run())
+
+
+def test_bulk() -> None:
+    async def run() -> None:
+        running = 0
+        peak = 0
+
+        async def join(channel_id: int) -> bool:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            if channel_id == 3:
+                raise ValueError(channel_id)
+            return True
+
+        results = await HTTPClient().bulk(join, range(10), concurrency=4)
+        assert peak == 4
+        assert results[:3] == [True, True, True]
+        assert isinstance(results[3], ValueError)
+        assert results[4:] == [True] * 6
+        assert await HTTPClient().bulk(join, []) == []
+        with pytest.raises(ValueError):
+            await HTTPClient().bulk(join, [1, 2, 3], concurrency=0)
+
+    asyncio.run(run())
+
+
+def test_broadcast() -> None:
+    async def run() -> None:
+        http = HTTPClient(codec="json")
+        bodies = []
+
+        async def request(method: str, route: str, **kwargs: Any) -> None:
+            if route == "/channels/2/messages":
+                raise HTTPException(403, "Missing access")
+            bodies.append(kwargs["data"])
+
+        http.request = request  # type: ignore
+        results = await http.broadcast([1, 2, 3], content="hi", concurrency=2)
+        assert results[0] is True and results[2] is True
+        assert isinstance(results[1], HTTPException)
+        # Encoded once and shared by all requests
+        assert bodies[0] == b'{"content":"hi"}'
+        assert bodies[0] is bodies[1]
+        with pytest.raises(ValueError):
+            await http.broadcast([1])
+
+    asyncio.run(run())
+
+
+def test_server_errors() -> None:
+    async def run() -> None:
+        calls: List[str] = []
+
+        async def handler(request: web.Request) -> web.Response:
+            calls.append(request.method)
+            return web.Response(status=502)
+
+        async def hang_up(request: web.Request) -> web.Response:
+            calls.append(request.method)
+            assert request.transport is not None
+            request.transport.close()
+            return web.Response(status=204)
+
+        app = web.Application()
+        app.router.add_route("*", "/api/v1/channels/1/messages", handler)
+        app.router.add_route("*", "/api/v1/channels/2/messages", hang_up)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        http = HTTPClient(
+            base_url=f"http://127.0.0.1:{port}/api/v1",
+            ratelimiter=RateLimiter(max_retries=2, backoff=0.001),
+        )
+        try:
+            # The server may have created the message, it must not be sent twice
+            with pytest.raises(HTTPException):
+                await http.send_message(1, "hi")
+            assert calls == ["POST"]
+            with pytest.raises(HTTPException):
+                await http.request("GET", "/channels/1/messages")
+            assert calls == ["POST", "GET", "GET", "GET"]
+            # Lost after sending, the server may have received it
+            calls.clear()
+            with pytest.raises(aiohttp.ClientConnectionError):
+                await http.send_message(2, "hi")
+            assert calls == ["POST"]
+        finally:
+            await http.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import pickle
+
+from veldpy import lazy, models
+from veldpy.state import State
+
+from .helpers import message_data, user_data
+
+
+def test_lazy_message() -> None:
+    state = State()
+    data = {
+        "id": 1,
+        "content": "hi",
+        "user": user_data(1),
+        "channel": {"id": 2, "name": "general", "members": [user_data(3)]},
+        "mentions": [user_data(3)],
+        "embed": {"author": {"value": "a"}, "title": "t"},
+    }
+    message = lazy.LazyMessage.from_dict(data, state)
+    assert isinstance(message, models.Message)
+    assert message.content == "hi"
+    assert state.get_user(1) is None
+
+    assert message.user is message.user
+    assert message.user is state.get_user(1)
+    assert message.mentions[0] is message.channel.members[0]
+    assert message.embed == models.Embed.from_dict(data["embed"])
+    assert message.embed is message.embed
+
+
+def test_lazy_user_status() -> None:
+    state = State()
+    user = lazy.LazyUser.from_dict(user_data(1), state)
+    assert lazy.LazyUser.from_dict(user_data(1, "dnd"), state) is user
+    assert user.status.value is models.Status.DND
+    assert models.User.from_dict(user_data(1, "away"), state) is user
+    assert user.status.value is models.Status.AWAY
+
+
+def test_pickle() -> None:
+    state = State()
+    state.store_users(models.User.from_dict(user_data(i)) for i in range(10, 1000))
+    data = message_data(user=1, channel=2)
+    message = lazy.LazyMessage.from_dict(data, state)
+    pickled = pickle.dumps(message)
+    # Neither the state nor the raw data are pickled along
+    assert len(pickled) < 1000
+    copy = pickle.loads(pickled)
+    assert type(copy) is models.Message and type(copy.user) is models.User
+    assert copy.user.status.value is models.Status.ONLINE
+    assert copy.channel.id == 2 and copy.content == "hi"
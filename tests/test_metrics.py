@@ -0,0 +1,64 @@
+import asyncio
+
+from typing import Any, Dict, List, Tuple
+
+from veldpy import Client, GatewayEvent
+from veldpy.metrics import Metrics
+
+
+def test_prometheus() -> None:
+    samples: List[Tuple[str, Dict[str, str], float]] = []
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.add_sink(lambda *sample: samples.append(sample))
+    metrics.inc("events_total", event="ready")
+    metrics.observe("latency_seconds", 0.5, route="/channels")
+    metrics.observe("latency_seconds", 5, route="/channels")
+    metrics.gauge("queue", lambda: 3)
+
+    histogram = metrics.get_histogram("latency_seconds", route="/channels")
+    assert histogram.count == 2
+    assert histogram.quantile(0.5) == 1.0
+    assert samples[0] == ("events_total", {"event": "ready"}, 1)
+    assert metrics.to_prometheus().splitlines() == [
+        "# TYPE events_total counter",
+        'events_total{event="ready"} 1',
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/channels",le="0.1"} 0',
+        'latency_seconds_bucket{route="/channels",le="1.0"} 1',
+        'latency_seconds_bucket{route="/channels",le="+Inf"} 2',
+        'latency_seconds_sum{route="/channels"} 5.5',
+        'latency_seconds_count{route="/channels"} 2',
+        "# TYPE queue gauge",
+        "queue 3",
+    ]
+
+
+def test_escapes_labels() -> None:
+    metrics = Metrics()
+    metrics.inc("errors_total", error='say "hi"\\\n')
+    assert metrics.to_prometheus().splitlines()[1] == (
+        'errors_total{error="say \\"hi\\"\\\\\\n"} 1'
+    )
+
+
+def test_client_metrics() -> None:
+    async def run() -> None:
+        metrics = Metrics()
+        client = Client(metrics=metrics)
+
+        async def listener(channel: Any) -> None:
+            await asyncio.sleep(0)
+
+        client.add_listener(GatewayEvent.CHANNEL_CREATE, listener)
+        client.dispatch(GatewayEvent.CHANNEL_CREATE, {"id": 1, "name": "general"})
+        while client._tasks:
+            await asyncio.sleep(0.001)
+        event = GatewayEvent.CHANNEL_CREATE.value
+        assert metrics.get_counter("veldpy_events_total", event=event) == 1
+        assert metrics.get_histogram("veldpy_parse_seconds", event=event).count == 1
+        listener_seconds = metrics.get_histogram("veldpy_listener_seconds", event=event)
+        assert listener_seconds.count == 2
+        assert metrics.read_gauges()["veldpy_pending_tasks"] == 0
+        assert metrics.read_gauges()["veldpy_cached_users"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+import asyncio
+import socket
+import sys
+
+from typing import List
+
+import pytest
+
+from veldpy import Client, GatewayEvent, models
+from veldpy.mock_gateway import MockGateway
+
+
+def test_events() -> None:
+    gateway = MockGateway(members=10, channels=2)
+    events = [gateway.make_event(i) for i in range(100)]
+    assert {event for event, _ in events} == {
+        "message:create",
+        "member:create",
+        "member:delete",
+        "user:typing",
+    }
+    for event, data in events:
+        if event == "message:create":
+            message = models.Message.from_dict(data)
+            assert message.channel.id in (1, 2)
+            assert 1 <= message.user.id <= 10
+    assert len(gateway.channel(1, with_members=True)["members"]) == 10
+
+
+@pytest.mark.skipif(
+    sys.version_info >= (3, 11),
+    reason="the socket.io 4 server passes coroutines to asyncio.wait",
+)
+def test_client_end_to_end() -> None:
+    async def run() -> None:
+        gateway = MockGateway(members=5, channels=2, rate=200)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        await gateway.start("127.0.0.1", port)
+        client = Client(gateway_url=f"http://127.0.0.1:{port}")
+        ready: List[models.ReadyPayload] = []
+        channels: List[models.Channel] = []
+        messages: List[models.Message] = []
+        client.add_listener(GatewayEvent.READY, ready.append)
+        client.add_listener(GatewayEvent.CHANNEL_CREATE, channels.append)
+        client.add_listener(GatewayEvent.MESSAGE_CREATE, messages.append)
+        task = asyncio.ensure_future(client.start("token"))
+        try:
+            for _ in range(200):
+                if len(messages) >= 5:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await client.close()
+            await gateway.stop()
+            await task
+
+        assert ready[0].token == "token" and len(ready[0].members) == 5
+        assert [channel.id for channel in channels] == [1, 2]
+        # The stream is the same for every client
+        script = MockGateway(members=5, channels=2)
+        expected = [script.make_event(i) for i in range(100)]
+        contents = [
+            data["content"] for event, data in expected if event == "message:create"
+        ]
+        assert [message.content for message in messages] == contents[: len(messages)]
+        assert len(messages) >= 5
+
+    asyncio.run(run())
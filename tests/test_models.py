@@ -34,3 +34,11 @@ def test_optional_fields() -> None:
         image_url=None,
         thumbnail_url=None,
     )
+
+
+def test_slots() -> None:
+    status = models.UserStatus(value=models.Status.ONLINE)
+    user = models.User(id=1, name="a", bot=False, status=status)
+    assert not hasattr(user, "__dict__")
+    assert user == models.User(id=1, name="b", bot=True, status=status)
+    assert models.Channel(id=1, name="a") == models.Channel(id=1, name="b")
@@ -0,0 +1,68 @@
+import asyncio
+
+from typing import List
+
+from veldpy import ClientPool, GatewayEvent
+from veldpy.columns import UserColumns
+
+from .helpers import user_data
+
+
+def test_pool() -> None:
+    started: List[str] = []
+
+    async def run() -> None:
+        pool = ClientPool(codec="json", lazy_models=True)
+        first = pool.add("a")
+        second = pool.add("b", bot=False, max_cached_users=10)
+        assert list(pool) == [first, second]
+        assert first.codec is second.codec is pool.codec
+        assert first.http is not second.http
+        assert second.state.max_users == 10
+
+        for client in pool:
+
+            async def start(token: str, bot: bool) -> None:
+                started.append(token)
+
+            client.start = start  # type: ignore
+        await pool.start()
+        assert pool.connector is not None
+        assert first.http.connector is second.http.connector is pool.connector
+        await pool.close()
+        assert pool.connector is None
+
+    asyncio.run(run())
+    assert started == ["a", "b"]
+
+
+def test_shared_members() -> None:
+    async def run() -> None:
+        pool = ClientPool(member_columns=UserColumns())
+        first, second = pool.add("a"), pool.add("b")
+        assert first.member_store is not None and second.member_store is not None
+        assert first.member_store is not second.member_store
+        assert first.member_store.columns is second.member_store.columns
+
+        second.dispatch(
+            GatewayEvent.CHANNEL_CREATE,
+            {"id": 7, "name": "b", "members": [user_data(2), user_data(3)]},
+        )
+        first.dispatch(
+            GatewayEvent.CHANNEL_CREATE,
+            {"id": 8, "name": "a", "members": [user_data(1)]},
+        )
+        # The first account reconnects, its ready knows nothing of channel 7
+        first.dispatch(GatewayEvent.DISCONNECT)
+        first.dispatch(
+            GatewayEvent.READY,
+            {"user": user_data(1), "members": [user_data(1)], "token": "t"},
+        )
+        first.dispatch(GatewayEvent.CHANNEL_DELETE, {"id": 8, "name": "a"})
+        assert second.member_store.query(7) == [2, 3]
+        assert first.member_store.query(8) == []
+        # Users are shared, channels are not
+        assert first.get_user(3) is not None
+        assert first.member_store.query(7) == []
+
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from veldpy.ratelimit import RateLimiter
+
+
+def test_bucket_waits_for_reset() -> None:
+    async def run() -> float:
+        ratelimiter = RateLimiter()
+        bucket = ratelimiter.get_bucket("POST /channels/1/messages")
+        assert ratelimiter.get_bucket("POST /channels/1/messages") is bucket
+        await bucket.acquire()
+        bucket.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.1"})
+
+        start = time.monotonic()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        assert ratelimiter.queue_depth == 1
+        assert ratelimiter.queue_depths() == {"POST /channels/1/messages": 1}
+        await waiter
+        assert ratelimiter.queue_depth == 0
+        assert bucket.remaining is None
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_retry_delay() -> None:
+    ratelimiter = RateLimiter(backoff=1, max_backoff=4)
+    assert ratelimiter.retry_delay(0, {"Retry-After": "2.5"}) == 2.5
+    assert 0.5 <= ratelimiter.retry_delay(0, {}) <= 1
+    assert 2 <= ratelimiter.retry_delay(10, {}) <= 4
+
+
+def test_malformed_headers() -> None:
+    async def run() -> None:
+        bucket = RateLimiter().get_bucket("GET /channels")
+        bucket.update({"X-RateLimit-Remaining": "many"})
+        bucket.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "soon"})
+        assert bucket.remaining is None
+
+    asyncio.run(run())
+
+
+def test_prunes_idle_buckets() -> None:
+    async def run() -> None:
+        ratelimiter = RateLimiter(max_buckets=2)
+        busy = ratelimiter.get_bucket("POST /channels/1/messages")
+        busy.block(60)
+        ratelimiter.get_bucket("POST /channels/2/messages")
+        ratelimiter.get_bucket("POST /channels/3/messages")
+        assert set(ratelimiter._buckets) == {
+            "POST /channels/1/messages",
+            "POST /channels/3/messages",
+        }
+        assert ratelimiter.get_bucket("POST /channels/1/messages") is busy
+
+    asyncio.run(run())
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from functools import partial
+from multiprocessing import Pipe
+from pathlib import Path
+
+import pytest
+
+from veldpy import Client, GatewayEvent, models
+from veldpy.mock_gateway import MockGateway
+from veldpy.sharding import ShardError, ShardLink, ShardSupervisor, shard_for
+
+from .helpers import free_port
+
+
+def test_shard_for() -> None:
+    message = {"channel": {"id": 5}}
+    assert shard_for(GatewayEvent.MESSAGE_CREATE, message, 4) == 1
+    assert shard_for(GatewayEvent.CHANNEL_CREATE, {"id": 6}, 4) == 2
+    assert shard_for(GatewayEvent.MEMBER_TYPING, {"id": 7}, 4) == 3
+    assert shard_for(GatewayEvent.READY, {}, 4) == -1
+
+
+def test_links() -> None:
+    async def run() -> None:
+        loop = asyncio.get_event_loop()
+        a, b = Pipe()
+        first = Client(shard_id=0, shard_count=2)
+        second = Client(shard_id=1, shard_count=2)
+        first.shards = ShardLink(first, a, 0, 2)
+        second.shards = ShardLink(second, b, 1, 2)
+        first.shards.attach(loop)
+        second.shards.attach(loop)
+
+        second.dispatch(GatewayEvent.CHANNEL_CREATE, {"id": 2, "name": "even"})
+        second.dispatch(GatewayEvent.CHANNEL_CREATE, {"id": 3, "name": "odd"})
+        assert second.get_channel(2) is None
+        assert second.get_channel(3) is not None
+
+        assert await first.shards.get_channel(3) == models.Channel(id=3, name="odd")
+        assert await first.shards.get_channel(5) is None
+
+        @second.shards.handler("double")
+        async def double(value: int) -> int:
+            return value * 2
+
+        assert await first.shards.request(1, "double", 21) == 42
+        with pytest.raises(ShardError):
+            await first.shards.request(1, "triple", 1)
+
+        loop.remove_reader(a.fileno())
+        loop.remove_reader(b.fileno())
+
+    asyncio.run(run())
+
+
+def test_unavailable_shard() -> None:
+    supervisor = ShardSupervisor(Client, shard_count=2)
+    parent, child = Pipe()
+    supervisor._conns[0] = parent
+    supervisor._route(("request", 0, 1, 7, "get_user", (1,)))
+    assert child.recv() == ("response", 1, 0, 7, False, "Shard 1 is unavailable")
+
+
+def shard_client(path: Path, url: str, shard_id: int, shard_count: int) -> Client:
+    # Runs in the shard process, records the channels of the messages it got
+    client = Client(gateway_url=url)
+    crashed = path / "crashed"
+
+    def on_message(message: models.Message) -> None:
+        if shard_id == 1 and not crashed.exists():
+            crashed.touch()
+            os._exit(1)
+        with open(path / f"shard{shard_id}", "a") as f:
+            f.write(f"{message.channel.id}\n")
+
+    client.add_listener(GatewayEvent.MESSAGE_CREATE, on_message)
+    return client
+
+
+@pytest.mark.skipif(
+    sys.version_info >= (3, 11),
+    reason="the socket.io 4 server passes coroutines to asyncio.wait",
+)
+def test_supervisor(tmp_path: Path) -> None:
+    gateway = MockGateway(members=5, channels=4, rate=100)
+    port = free_port()
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(gateway.start("127.0.0.1", port))
+    server = threading.Thread(target=loop.run_forever)
+    server.start()
+
+    factory = partial(shard_client, tmp_path, f"http://127.0.0.1:{port}")
+    supervisor = ShardSupervisor(factory, shard_count=2, restart_delay=0.1)
+    runner = threading.Thread(target=supervisor.run)
+    runner.start()
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if all((tmp_path / f"shard{i}").exists() for i in range(2)):
+                break
+            time.sleep(0.1)
+    finally:
+        supervisor.stop()
+        runner.join()
+        asyncio.run_coroutine_threadsafe(gateway.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        server.join()
+        # Sockets of the terminated shards are still open
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    # Shard 1 crashed on its first message and was restarted
+    assert (tmp_path / "crashed").exists()
+    assert supervisor._crashes == {1: 1}
+    for shard_id in range(2):
+        channels = (tmp_path / f"shard{shard_id}").read_text().split()
+        assert channels and {int(id) % 2 for id in channels} == {shard_id}
@@ -0,0 +1,103 @@
+import asyncio
+
+from pathlib import Path
+
+import pytest
+
+from veldpy import Client, GatewayEvent, MemberStore, models
+from veldpy.snapshot import SnapshotError, dump, load_snapshot, save_snapshot
+from veldpy.state import State
+
+from .helpers import make_user, user_data
+
+
+def snapshot_user(id: int) -> models.User:
+    # Every field that is encoded, with non-ASCII text
+    return make_user(
+        id,
+        name=f"üser{id}",
+        bot=id == 1,
+        status=models.UserStatus(value=models.Status.DND, status_text="busy"),
+        avatar_url=None if id % 2 else f"https://veld.dev/{id}.png",
+    )
+
+
+def test_roundtrip(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.bin")
+    state = State()
+    users = [snapshot_user(i) for i in range(1, 5)]
+    state.add_channel(models.Channel(id=10, name="general", members=users[:3]))
+    state.store_user(users[3])
+    save_snapshot(state, path)
+
+    restored = State()
+    assert load_snapshot(restored, path)
+    assert sorted(restored.users, key=lambda u: u.id) == users
+    for user in users:
+        cached = restored.get_user(user.id)
+        assert cached is not None
+        assert (cached.name, cached.bot, cached.status, cached.avatar_url) == (
+            user.name,
+            user.bot,
+            user.status,
+            user.avatar_url,
+        )
+    channel = restored.get_channel(10)
+    assert channel is not None and channel.name == "general"
+    assert sorted(restored.get_member_ids(10)) == [1, 2, 3]
+
+    restored.reconcile(users[1:])
+    assert sorted(restored.get_member_ids(10)) == [2, 3]
+
+    assert not load_snapshot(State(), str(tmp_path / "missing.bin"))
+
+
+def test_corrupt(tmp_path: Path) -> None:
+    path = tmp_path / "cache.bin"
+    path.write_bytes(dump([snapshot_user(1)], [])[:-3])
+    with pytest.raises(SnapshotError):
+        load_snapshot(State(), str(path))
+    path.write_bytes(b"")
+    with pytest.raises(SnapshotError):
+        load_snapshot(State(), str(path))
+
+
+def test_drops_stale_channels(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.bin")
+    state = State()
+    for id in (10, 11):
+        state.add_channel(models.Channel(id=id, name="general", members=[]))
+    save_snapshot(state, path)
+
+    async def run() -> None:
+        client = Client(snapshot_path=path, resync_timeout=0.01)
+        assert client.get_channel(11) is not None
+        ready = {"user": user_data(1), "members": [], "token": "t"}
+        client.dispatch(GatewayEvent.READY, ready)
+        client.dispatch(GatewayEvent.CHANNEL_CREATE, {"id": 10, "name": "general"})
+        await asyncio.sleep(0.02)
+        # Channel 11 was not announced again, it was left while offline
+        assert [channel.id for channel in client.channels] == [10]
+        await client.http.close()
+
+    asyncio.run(run())
+
+
+def test_member_store(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.bin")
+
+    async def run() -> None:
+        client = Client(snapshot_path=path, member_store=MemberStore())
+        ready = {"user": user_data(1), "members": [user_data(2)], "token": "t"}
+        channel = {"id": 10, "name": "general", "members": [user_data(2)]}
+        client.dispatch(GatewayEvent.READY, ready)
+        client.dispatch(GatewayEvent.CHANNEL_CREATE, channel)
+        await client.close()
+
+        client = Client(snapshot_path=path, member_store=MemberStore())
+        assert client.member_store is not None
+        assert client.member_store.query(10) == [2]
+        assert client.get_user(2) is not None
+        await client.http.close()
+
+    asyncio.run(run())
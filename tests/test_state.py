@@ -0,0 +1,59 @@
+from veldpy import models
+from veldpy.state import State
+
+from .helpers import make_user
+
+
+def test_channel_members() -> None:
+    state = State()
+    users = [make_user(i) for i in range(4)]
+    state.add_channel(models.Channel(id=1, name="general", members=users[:3]))
+    channel = state.get_channel(1)
+    assert channel is not None
+    assert state.get_user(2) is users[2]
+
+    assert state.add_member(1, users[3])
+    assert not state.add_member(1, users[3])
+    assert not state.add_member(2, users[3])
+
+    assert state.remove_member(1, 0) is users[0]
+    assert state.remove_member(1, 0) is None
+    assert sorted(u.id for u in channel.members) == [1, 2, 3]
+    assert sorted(state.get_member_ids(1)) == [1, 2, 3]
+
+    assert state.remove_member(1, 3) is users[3]
+    assert state.remove_member(1, 1) is users[1]
+    assert channel.members == [users[2]]
+    assert state.is_member(1, 2)
+
+
+def test_remove_channel() -> None:
+    state = State()
+    state.add_channel(models.Channel(id=1, name="general", members=[make_user(1)]))
+    assert state.remove_channel(1) is not None
+    assert state.get_channel(1) is None
+    assert not state.is_member(1, 1)
+    assert state.channels == []
+
+
+def test_user_interning() -> None:
+    state = State()
+    data = {"id": 7, "name": "old", "bot": False, "status": {"value": "online"}}
+    user = models.User.from_dict(data, state)
+    data = {**data, "name": "new", "status": {"value": "dnd"}}
+    assert models.User.from_dict(data, state) is user
+    assert user.name == "new"
+    assert user.status.value is models.Status.DND
+
+
+def test_user_eviction() -> None:
+    state = State(max_users=2)
+    state.add_channel(models.Channel(id=1, name="general", members=[make_user(1)]))
+    for i in range(2, 6):
+        state.store_user(make_user(i))
+    assert state.get_user(1) is not None
+    assert state.get_user(2) is None
+    assert sorted(u.id for u in state.users) == [1, 4, 5]
+
+    state.remove_member(1, 1)
+    assert sorted(u.id for u in state.users) == [1, 5]
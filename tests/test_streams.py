@@ -0,0 +1,60 @@
+import asyncio
+
+from typing import Any, Dict, List
+
+import pytest
+
+from veldpy import Client, GatewayEvent
+
+EVENT = GatewayEvent.CHANNEL_DELETE
+
+
+def channel(id: int) -> Dict[str, Any]:
+    return {"id": id, "name": f"channel{id}"}
+
+
+def test_wait_for() -> None:
+    async def run() -> None:
+        client = Client()
+        waiter = asyncio.ensure_future(
+            client.wait_for(EVENT, check=lambda c: c.id == 2, timeout=1)
+        )
+        await asyncio.sleep(0)
+        client.dispatch(EVENT, channel(1))
+        assert not waiter.done()
+        client.dispatch(EVENT, channel(2))
+        assert (await waiter).id == 2
+        assert EVENT not in client._waiters
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.wait_for(EVENT, timeout=0.01)
+        assert EVENT not in client._waiters
+
+    asyncio.run(run())
+
+
+def test_stream() -> None:
+    async def run() -> None:
+        client = Client()
+        seen: List[int] = []
+        async with client.stream(EVENT, maxsize=3) as stream:
+            for i in range(5):
+                client.dispatch(EVENT, channel(i))
+            assert stream.dropped == 2
+            async for parsed in stream:
+                seen.append(parsed.id)
+                if len(seen) == 3:
+                    break
+        assert seen == [2, 3, 4]
+        assert EVENT not in client._streams
+
+        stream = client.stream(EVENT)
+        consumer = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        client.dispatch(EVENT, channel(7))
+        assert (await consumer).id == 7
+        stream.close()
+        with pytest.raises(StopAsyncIteration):
+            await stream.__anext__()
+
+    asyncio.run(run())
@@ -27,8 +27,14 @@ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
+from .batching import MessageBatcher
 from .client import Client
+from .codec import JSONCodec
+from .columns import MemberStore
+from .dispatcher import DispatchPolicy, Dispatcher, Overflow
 from .events import GatewayEvent
+from .history import MessageHistory
+from .metrics import Metrics
 from .models import (
     Channel,
     Embed,
@@ -38,6 +44,10 @@ from .models import (
     ReadyPayload,
     User,
 )
+from .pool import ClientPool
+from .sharding import ShardSupervisor
+from .state import State
+from .streams import EventStream
 
 __title__ = "veldpy"
 __version__ = "0.1.0"
@@ -0,0 +1,177 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .models import Embed
+
+if TYPE_CHECKING:
+    from .http import HTTPClient
+
+# Coalesces small messages to the same channel into one request.
+# Messages are collected for a short window after the first one arrives
+# and then sent joined by a separator. Requests for one channel are sent
+# one after another, so messages arrive in the order they were queued.
+
+log = logging.getLogger(__name__)
+
+
+class _Batch:
+    __slots__ = ("contents", "futures", "length", "handle")
+
+    def __init__(self) -> None:
+        self.contents: List[str] = []
+        self.futures: List[asyncio.Future[bool]] = []
+        self.length = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class MessageBatcher:
+    def __init__(
+        self,
+        http: HTTPClient,
+        window: float = 0.05,
+        max_messages: int = 10,
+        max_length: int = 2000,
+        separator: str = "\n",
+    ) -> None:
+        """
+        window is how many seconds messages are collected for.
+        A batch is sent early once it holds max_messages messages or another
+        message would make its content longer than max_length.
+        """
+        self.http = http
+        self.window = window
+        self.max_messages = max_messages
+        self.max_length = max_length
+        self.separator = separator
+        self._batches: Dict[int, _Batch] = {}
+        self._tails: Dict[int, asyncio.Future[None]] = {}
+
+    def send(
+        self,
+        channel_id: int,
+        content: Optional[str] = None,
+        embed: Optional[Embed] = None,
+    ) -> asyncio.Future[bool]:
+        """
+        Queues a message.
+        The returned future resolves to True once the batch holding the
+        message was sent, or to the exception sending it failed with.
+        Messages with an embed are never coalesced.
+        """
+        if content is None and embed is None:
+            raise ValueError("Either content or embed must be supplied")
+        loop = asyncio.get_event_loop()
+        future: asyncio.Future[bool] = loop.create_future()
+        if embed is not None or content is None:
+            self.flush(channel_id)
+            self._send(channel_id, [future], content, embed)
+            return future
+
+        batch = self._batches.get(channel_id)
+        if batch is not None and (
+            batch.length + len(self.separator) + len(content) > self.max_length
+        ):
+            self.flush(channel_id)
+            batch = None
+        if batch is None:
+            batch = self._batches[channel_id] = _Batch()
+            batch.handle = loop.call_later(self.window, self.flush, channel_id)
+        else:
+            batch.length += len(self.separator)
+        batch.contents.append(content)
+        batch.futures.append(future)
+        batch.length += len(content)
+        if len(batch.futures) >= self.max_messages:
+            self.flush(channel_id)
+        return future
+
+    def flush(self, channel_id: Optional[int] = None) -> None:
+        """Sends the queued messages of a channel, or of all channels, now."""
+        if channel_id is None:
+            for channel_id in list(self._batches):
+                self.flush(channel_id)
+            return
+        batch = self._batches.pop(channel_id, None)
+        if batch is None:
+            return
+        if batch.handle is not None:
+            batch.handle.cancel()
+        self._send(channel_id, batch.futures, self.separator.join(batch.contents), None)
+
+    @property
+    def pending(self) -> int:
+        """Number of messages waiting for their batch to be sent."""
+        return sum(len(batch.futures) for batch in self._batches.values())
+
+    def _send(
+        self,
+        channel_id: int,
+        futures: List[asyncio.Future[bool]],
+        content: Optional[str],
+        embed: Optional[Embed],
+    ) -> None:
+        previous = self._tails.get(channel_id)
+        tail = asyncio.ensure_future(
+            self._do_send(channel_id, previous, futures, content, embed)
+        )
+        self._tails[channel_id] = tail
+        tail.add_done_callback(lambda _: self._forget(channel_id, tail))
+
+    def _forget(self, channel_id: int, tail: asyncio.Future[None]) -> None:
+        if self._tails.get(channel_id) is tail:
+            del self._tails[channel_id]
+
+    async def _do_send(
+        self,
+        channel_id: int,
+        previous: Optional[asyncio.Future[None]],
+        futures: List[asyncio.Future[bool]],
+        content: Optional[str],
+        embed: Optional[Embed],
+    ) -> None:
+        if previous is not None:
+            await previous
+        try:
+            sent = await self.http.send_message(channel_id, content, embed)
+        except Exception as e:
+            log.debug(f"Sending a batch of {len(futures)} messages failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future in futures:
+                if not future.done():
+                    future.set_result(sent)
@@ -30,71 +30,453 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 import asyncio
 import inspect
 import logging
+import random
+import time
 
 from collections import defaultdict
-from functools import partial
-from typing import Any, Callable, Dict, List, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import socketio
 
+from .coalesce import Coalescer
+from .codec import JSONCodec, get_codec
+from .columns import MemberStore, MemberView, parse_channel, parse_ready
+from .dispatcher import Dispatcher
 from .events import GatewayEvent
+from .filters import RawFilter, make_filter
+from .history import MessageHistory
 from .http import HTTPClient
-from .models import Channel, MemberEvent, Message, ReadyPayload, User
+from .lazy import LazyChannel, LazyMemberEvent, LazyMessage, LazyUser
+from .metrics import Metrics
+from .models import Channel, Embed, MemberEvent, Message, ReadyPayload, User
+from .sharding import ShardLink, shard_for
+from .snapshot import SnapshotError, load_snapshot, save_snapshot
+from .state import State
+from .streams import Check, EventStream
 
 # This is an implementation of a simple Client for the socket.io server
 # It does only faciliate connecting, models and events
-# For a command framework, try the exts
+# For a command framework, try veldpy.ext.commands
 
 log = logging.getLogger(__name__)
 
+GATEWAY_URL = "https://chat-gateway.veld.dev"
+
 
 class Client:
-    def __init__(self) -> None:
-        self.sio = socketio.AsyncClient()
-        self.http = HTTPClient()
+    def __init__(
+        self,
+        max_cached_users: Optional[int] = 10_000,
+        lazy_models: bool = False,
+        codec: Union[str, JSONCodec, None] = None,
+        http: Optional[HTTPClient] = None,
+        gateway_url: str = GATEWAY_URL,
+        dispatcher: Optional[Dispatcher] = None,
+        metrics: Optional[Metrics] = None,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        shard_id: int = 0,
+        shard_count: int = 1,
+        snapshot_path: Optional[str] = None,
+        resync_timeout: float = 30.0,
+        reconnect_delay: float = 1.0,
+        reconnect_delay_max: float = 60.0,
+        history: Optional[MessageHistory] = None,
+        member_store: Optional[MemberStore] = None,
+        typing_window: Optional[float] = None,
+    ) -> None:
+        """
+        max_cached_users limits how many users outside of any joined
+        channel are kept in the cache.
+        lazy_models makes events decode nested fields like embeds, mentions
+        and user statuses only when they are first accessed.
+        codec is the JSON codec (or its name) used for the gateway and HTTP,
+        by default the fastest installed one.
+        gateway_url is where the gateway and, unless http is passed,
+        the REST API are expected, e.g. a local veldpy.mock_gateway.
+        http can be passed to tune the connection pool, timeouts and
+        API URL of the HTTP client.
+        dispatcher bounds how many coroutine listeners run at once and how
+        many events may wait, by default every listener gets its own task.
+        metrics collects event counts, parse and listener timings, queue
+        sizes and HTTP latencies when passed.
+        thread_workers and process_workers size the pools used by listeners
+        registered with an executor, None uses the defaults of
+        concurrent.futures.
+        shard_id and shard_count make the client only dispatch the events of
+        its share of the channels, see veldpy.sharding.ShardSupervisor.
+        snapshot_path is a file the cache is saved to on close and restored
+        from on the next start.
+        resync_timeout is how many seconds after a ready that follows a
+        snapshot or a reconnect cached channels have to be announced again,
+        the ones that are not were left or deleted and are dropped.
+        reconnect_delay is the delay before the first reconnect attempt, it
+        doubles for every failed one up to reconnect_delay_max. While
+        disconnected, HTTP requests wait for the connection to come back.
+        history keeps the most recent messages of every channel when passed.
+        member_store keeps the users of the ready payload and the members of
+        channels in columns instead of User objects, for very large member
+        lists. Channels then have an empty member list, use
+        member_store.query instead. Users in no channel are bounded by the
+        max_users of the store instead of max_cached_users.
+        typing_window makes typing events of a user that typed less than
+        typing_window seconds ago be dropped before they are parsed.
+        """
+        self.codec = get_codec(codec)
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_delay_max = reconnect_delay_max
+        self.sio = socketio.AsyncClient(
+            json=self.codec,
+            reconnection_delay=reconnect_delay,
+            reconnection_delay_max=reconnect_delay_max,
+            randomization_factor=0.5,
+        )
+        if http is None:
+            http = HTTPClient(
+                codec=self.codec,
+                base_url=f"{gateway_url.rstrip('/')}/api/v1",
+                metrics=metrics,
+            )
+        elif http.metrics is None:
+            http.metrics = metrics
+        self.http = http
+        self.gateway_url = gateway_url
+        self.dispatcher = dispatcher
+        if dispatcher is not None:
+            if dispatcher.on_error is None:
+                dispatcher.on_error = self.on_error
+            if dispatcher.metrics is None:
+                dispatcher.metrics = metrics
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+        self.metrics = metrics
+        if metrics is not None:
+            self._register_gauges(metrics)
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        # Set by the supervisor when running as a shard
+        self.shards: Optional[ShardLink] = None
         self._listeners: Dict[GatewayEvent, List[Callable[..., Any]]] = defaultdict(
             lambda: []
         )
+        self._filtered: Dict[
+            GatewayEvent, List[Tuple[RawFilter, Callable[..., Any]]]
+        ] = defaultdict(lambda: [])
+        self.history = history
+        self.member_store = member_store
+        self._typing = Coalescer(typing_window) if typing_window else None
+        self._waiters: Dict[
+            GatewayEvent, List[Tuple[Optional[Check], "asyncio.Future[Any]"]]
+        ] = {}
+        self._streams: Dict[GatewayEvent, List[EventStream]] = {}
         self.register_handlers()
-        self._parsers = {
-            GatewayEvent.MESSAGE_CREATE: Message.from_dict,
-            GatewayEvent.MEMBER_CREATE: MemberEvent.from_dict,
-            GatewayEvent.MEMBER_DELETE: MemberEvent.from_dict,
-            GatewayEvent.MEMBER_TYPING: User.from_dict,
-            GatewayEvent.READY: ReadyPayload.from_dict,
-            GatewayEvent.CHANNEL_CREATE: Channel.from_dict,
-            GatewayEvent.CHANNEL_DELETE: Channel.from_dict,
+        self.state = State(max_users=max_cached_users)
+        self.snapshot_path = snapshot_path
+        self.resync_timeout = resync_timeout
+        self._stale = False
+        # cached channels that were not announced again since a stale ready
+        self._unconfirmed: Set[int] = set()
+        self._resync: Optional[asyncio.TimerHandle] = None
+        if snapshot_path is not None:
+            try:
+                self._stale = load_snapshot(self.state, snapshot_path, member_store)
+            except SnapshotError as e:
+                log.warning(f"Ignoring snapshot {snapshot_path}: {e}")
+                self.state.clear()
+        message: Type[Message] = LazyMessage if lazy_models else Message
+        member: Type[MemberEvent] = LazyMemberEvent if lazy_models else MemberEvent
+        user: Type[User] = LazyUser if lazy_models else User
+        channel: Type[Channel] = LazyChannel if lazy_models else Channel
+        self._parsers: Dict[GatewayEvent, Callable[[Dict[str, Any]], Any]] = {
+            GatewayEvent.MESSAGE_CREATE: partial(message.from_dict, state=self.state),
+            GatewayEvent.MEMBER_CREATE: partial(member.from_dict, state=self.state),
+            GatewayEvent.MEMBER_DELETE: partial(member.from_dict, state=self.state),
+            GatewayEvent.MEMBER_TYPING: partial(user.from_dict, state=self.state),
+            GatewayEvent.READY: partial(ReadyPayload.from_dict, state=self.state),
+            GatewayEvent.CHANNEL_CREATE: partial(channel.from_dict, state=self.state),
+            GatewayEvent.CHANNEL_DELETE: partial(channel.from_dict, state=self.state),
         }
-        self.channels: List[Channel] = []
+        if member_store is not None:
+            self._parsers[GatewayEvent.READY] = partial(parse_ready, member_store)
+            self._parsers[GatewayEvent.CHANNEL_CREATE] = partial(
+                parse_channel, member_store
+            )
+            # Only the id is needed, the members are not parsed at all
+            self._parsers[GatewayEvent.CHANNEL_DELETE] = partial(parse_channel, None)
         self.user: Optional[User] = None
 
-    def add_listener(self, event: GatewayEvent, callback: Callable[..., Any]) -> None:
-        """Adds an event listener for a specific event."""
-        self._listeners[event].append(callback)
+    @property
+    def channels(self) -> List[Channel]:
+        """All channels the client is currently in."""
+        return self.state.channels
+
+    @property
+    def users(self) -> List[User]:
+        """All users the client currently knows about."""
+        return self.state.users
+
+    def get_channel(self, channel_id: int) -> Optional[Channel]:
+        """Returns a cached channel by its ID."""
+        return self.state.get_channel(channel_id)
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        """Returns a cached user by its ID."""
+        user = self.state.get_user(user_id)
+        if user is None and self.member_store is not None:
+            return self.member_store.get_user(user_id)
+        return user
+
+    def get_message(self, message_id: int) -> Optional[Message]:
+        """Returns a recent message by its ID if the history is enabled."""
+        if self.history is None:
+            return None
+        return self.history.get(message_id)
+
+    def _register_gauges(self, metrics: Metrics) -> None:
+        metrics.gauge("veldpy_pending_tasks", lambda: len(self._tasks))
+        metrics.gauge("veldpy_http_queue_depth", lambda: self.http.queue_depth)
+        metrics.gauge("veldpy_cached_users", lambda: self.state.user_count)
+        if (dispatcher := self.dispatcher) is not None:
+            metrics.gauge("veldpy_dispatcher_pending", lambda: dispatcher.pending)
+            metrics.gauge("veldpy_dispatcher_running", lambda: dispatcher.running)
+
+    def add_listener(
+        self,
+        event: GatewayEvent,
+        callback: Callable[..., Any],
+        executor: Union[str, Executor, None] = None,
+        raw_filter: Optional[RawFilter] = None,
+    ) -> None:
+        """
+        Adds an event listener for a specific event.
+        executor runs a plain function off the event loop, either "thread",
+        "process" or an Executor. For processes the function and the parsed
+        event have to be picklable.
+        raw_filter is called with the raw event data, the listener only
+        runs if it returns True. Listeners with a filter run after the
+        ones without.
+        """
+        if executor is not None:
+            callback = self._run_in_executor(callback, executor)
+        if raw_filter is not None:
+            self._filtered[event].append((raw_filter, callback))
+        else:
+            self._listeners[event].append(callback)
+
+    def _get_executor(self, executor: Union[str, Executor]) -> Executor:
+        if isinstance(executor, Executor):
+            return executor
+        if executor == "thread":
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(self.thread_workers)
+            return self._thread_pool
+        if executor == "process":
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(self.process_workers)
+            return self._process_pool
+        raise ValueError(f"Unknown executor {executor!r}")
+
+    def _run_in_executor(
+        self, callback: Callable[..., Any], executor: Union[str, Executor]
+    ) -> Callable[..., Awaitable[Any]]:
+        # Fail early for typos, the pool itself is only created when needed
+        if not isinstance(executor, Executor) and executor not in (
+            "thread",
+            "process",
+        ):
+            raise ValueError(f"Unknown executor {executor!r}")
+
+        @wraps(callback)
+        async def run(*args: Any) -> Any:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                self._get_executor(executor), partial(callback, *args)
+            )
+
+        return run
 
     def dispatch(
         self, event: GatewayEvent, data: Optional[Dict[str, Any]] = None
     ) -> None:
         """Dispatches the raw gateway event, parses it and calls the listeners."""
-        log.debug(f"Received event: {event}")
+        # Not an f-string, this runs for every event even if debug is off
+        log.debug("Received event: %s", event)
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.inc("veldpy_events_total", event=event.value)
+        if (
+            event is GatewayEvent.MEMBER_TYPING
+            and self._typing is not None
+            and data is not None
+            and not self._typing(data)
+        ):
+            if metrics is not None:
+                metrics.inc("veldpy_events_coalesced_total", event=event.value)
+            return
         callbacks = self._listeners[event]
-        if not callbacks:
+        if data is not None and (filtered := self._filtered.get(event)):
+            wanted = []
+            for check, callback in filtered:
+                # A filter that chokes on malformed data is a listener error
+                try:
+                    if check(data):
+                        wanted.append(callback)
+                except Exception as e:
+                    self.on_error(event, e)
+            if wanted:
+                callbacks = [*callbacks, *wanted]
+        subscribed = event in self._waiters or event in self._streams
+        record = self.history is not None and event is GatewayEvent.MESSAGE_CREATE
+        if not callbacks and not subscribed and not record:
+            return
+        if (
+            self.shard_count > 1
+            and data is not None
+            and shard_for(event, data, self.shard_count) not in (-1, self.shard_id)
+        ):
             return
 
         if data is not None:
             if parser := self._parsers.get(event, None):
-                parsed = parser(data)
-                for callback in callbacks:
-                    maybe_coro = callback(parsed)
-                    if inspect.iscoroutine(maybe_coro):
-                        asyncio.create_task(maybe_coro)
+                start = time.perf_counter()
+                args: Tuple[Any, ...] = (parser(data),)
+                if metrics is not None:
+                    metrics.observe(
+                        "veldpy_parse_seconds",
+                        time.perf_counter() - start,
+                        event=event.value,
+                    )
             else:
                 log.warning(f"No parser for event {event} found")
+                return
         else:
-            for callback in callbacks:
-                maybe_coro = callback()
+            args = ()
+
+        if record:
+            self.history.add(args[0])  # type: ignore
+        if subscribed:
+            self._notify(event, args[0] if args else None)
+        if not callbacks:
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.submit(event, callbacks, args)
+            return
+        for callback in callbacks:
+            start = time.perf_counter()
+            try:
+                maybe_coro = callback(*args)
+            except Exception as e:
+                self.on_error(event, e)
+                continue
+            if metrics is not None:
                 if inspect.iscoroutine(maybe_coro):
-                    asyncio.create_task(maybe_coro)
+                    maybe_coro = metrics.time(
+                        "veldpy_listener_seconds", maybe_coro, event=event.value
+                    )
+                else:
+                    metrics.observe(
+                        "veldpy_listener_seconds",
+                        time.perf_counter() - start,
+                        event=event.value,
+                    )
+            if inspect.iscoroutine(maybe_coro):
+                task = asyncio.create_task(maybe_coro)
+                self._tasks.add(task)
+                task.add_done_callback(partial(self._task_done, event))
+
+    def _notify(self, event: GatewayEvent, value: Any) -> None:
+        if (waiters := self._waiters.get(event)) is not None:
+            remaining: List[Tuple[Optional[Check], "asyncio.Future[Any]"]] = []
+            for check, future in waiters:
+                if future.done():
+                    continue
+                try:
+                    if check is None or check(value):
+                        future.set_result(value)
+                        continue
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                remaining.append((check, future))
+            if remaining:
+                self._waiters[event] = remaining
+            else:
+                del self._waiters[event]
+        for stream in self._streams.get(event, ()):
+            try:
+                stream.feed(value)
+            except Exception as e:
+                self.on_error(event, e)
+
+    async def wait_for(
+        self,
+        event: GatewayEvent,
+        check: Optional[Check] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Waits for the next event that passes check and returns it parsed.
+        Raises asyncio.TimeoutError after timeout seconds.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(event, []).append((check, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # Remove the waiter right away if it timed out or was cancelled
+            if (waiters := self._waiters.get(event)) is not None:
+                waiters[:] = [w for w in waiters if w[1] is not future]
+                if not waiters:
+                    del self._waiters[event]
+
+    def stream(
+        self, event: GatewayEvent, check: Optional[Check] = None, maxsize: int = 100
+    ) -> EventStream:
+        """
+        Returns an async iterator over the events that pass check.
+        Up to maxsize events are queued, older ones are dropped if the
+        consumer falls behind. Close the stream, or use it as an async
+        context manager, to stop receiving events.
+        """
+        stream = EventStream(event, check, maxsize, on_close=self._remove_stream)
+        self._streams.setdefault(event, []).append(stream)
+        return stream
+
+    def _remove_stream(self, stream: EventStream) -> None:
+        streams = self._streams.get(stream.event, [])
+        if stream in streams:
+            streams.remove(stream)
+        if not streams:
+            self._streams.pop(stream.event, None)
+
+    def _task_done(self, event: GatewayEvent, task: "asyncio.Task[Any]") -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            self.on_error(event, exc)
+
+    def on_error(self, event: GatewayEvent, exc: BaseException) -> None:
+        """
+        Called when a listener raised an exception or the dispatcher
+        dropped an event. Override this to handle errors yourself.
+        """
+        log.error(f"Exception in listener for {event}", exc_info=exc)
 
     def register_handlers(self) -> None:
         """
@@ -106,15 +488,26 @@ class Client:
         """
         for event in GatewayEvent:
             # Check if there is a default method on the client
-            if callback := getattr(self, f"on_{event.value.replace('-', '_')}", None):
+            if callback := getattr(self, f"on_{event.name.lower()}", None):
                 self.add_listener(event, callback)
+            # A plain function, socket.io calls it right away for every packet
             self.sio.on(event.value, partial(self.dispatch, event))
 
     def event(
-        self, event_type: Optional[GatewayEvent] = None
+        self,
+        event_type: Optional[GatewayEvent] = None,
+        executor: Union[str, Executor, None] = None,
+        *,
+        bot: Optional[bool] = None,
+        prefix: Union[str, Tuple[str, ...], None] = None,
+        channels: Optional[Iterable[int]] = None,
     ) -> Callable[[Callable[[Any], Any]], Callable[[Any], Any]]:
         """
         Decorator that registers a new event handler.
+        See add_listener for executor.
+        bot, prefix and channels are checked before the event is parsed,
+        see veldpy.filters.make_filter. Events no listener wants are
+        not parsed at all.
         """
 
         # Hack to keep event_type in scope :^)
@@ -132,12 +525,50 @@ class Client:
                 if event_type is None:
                     return func
 
-            self.add_listener(event_type, func)
+            raw_filter = make_filter(event_type, bot, prefix, channels)
+            self.add_listener(event_type, func, executor, raw_filter)
 
             return func
 
         return inner
 
+    async def join_channels(
+        self, channel_ids: Iterable[int], concurrency: int = 10
+    ) -> List[Union[bool, Exception]]:
+        """
+        Joins many channels with at most concurrency requests at once.
+        Returns True or the exception for every channel, in order.
+        """
+        return await self.http.join_channels(channel_ids, concurrency)
+
+    async def create_channels(
+        self, names: Iterable[str], concurrency: int = 10
+    ) -> List[Union[Channel, Exception]]:
+        """
+        Creates many channels with at most concurrency requests at once
+        and caches the created ones once all requests are done.
+        Returns the channel or the exception for every name, in order.
+        """
+        results = await self.http.create_channels(names, concurrency)
+        for result in results:
+            if isinstance(result, Channel):
+                self.state.add_channel(result)
+        return results
+
+    async def broadcast(
+        self,
+        channel_ids: Iterable[int],
+        content: Optional[str] = None,
+        embed: Optional[Embed] = None,
+        concurrency: int = 10,
+    ) -> List[Union[bool, Exception]]:
+        """
+        Sends the same message to many channels with at most concurrency
+        requests at once, encoding it only once.
+        Returns True or the exception for every channel, in order.
+        """
+        return await self.http.broadcast(channel_ids, content, embed, concurrency)
+
     async def set_nick(self, name: str) -> None:
         """
         Sets the nickname for the bot.
@@ -158,9 +589,27 @@ class Client:
         self.token = token
         self.is_bot = bot
         log.debug(f"About to connect, listeners are: {self._listeners}")
-        await self.sio.connect("https://chat-gateway.veld.dev")
+        await self.connect()
         await self.sio.wait()
 
+    async def connect(self) -> None:
+        """
+        Connects to the gateway, retrying with a jittered exponential backoff.
+        Once connected, socket.io reconnects on its own with the same delays.
+        """
+        attempt = 0
+        while True:
+            try:
+                await self.sio.connect(self.gateway_url)
+                return
+            except socketio.exceptions.ConnectionError as e:
+                delay = self.reconnect_delay * 2**attempt
+                # Full jitter keeps many bots from reconnecting at once
+                delay = random.uniform(0, min(self.reconnect_delay_max, delay))
+                log.warning(f"Connecting failed: {e}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
     def run(self, token: Optional[str] = None, bot: bool = True) -> None:
         """
         Starts a new event loop in asyncio and runs the bot forever
@@ -176,28 +625,92 @@ class Client:
 
             traceback.print_exc()
         finally:
-            loop.run_until_complete(self.sio.disconnect())
+            loop.run_until_complete(self.close())
+
+    async def close(self) -> None:
+        """
+        Disconnects from the gateway, closes the HTTP session,
+        shuts down the executors and saves the snapshot.
+        """
+        await self.sio.disconnect()
+        await self.http.close()
+        if self._resync is not None:
+            self._resync.cancel()
+            self._resync = None
+        if self.snapshot_path is not None:
+            save_snapshot(self.state, self.snapshot_path, self.member_store)
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._thread_pool = self._process_pool = None
 
     async def on_connect(self) -> None:
         await self.login()
 
     def on_ready(self, payload: ReadyPayload) -> None:
-        self.user = payload.user
+        if self.user is not None:
+            self.state.unpin_user(self.user.id)
+        self.user = self.state.pin_user(payload.user)
+        members = payload.members
+        if isinstance(members, MemberView):
+            # The members already are in the member store
+            if self._stale and self.member_store is not None:
+                self.member_store.reconcile([payload.user.id, *members.ids()])
+            members = []
+        else:
+            self.state.store_users(members)
+        if self._stale:
+            # Restored from a snapshot or missed events while disconnected
+            self.state.reconcile([payload.user, *members])
+            self._stale = False
+            # The gateway announces every channel again after the ready
+            self._unconfirmed = {channel.id for channel in self.state.channels}
+            if self._resync is not None:
+                self._resync.cancel()
+            self._resync = asyncio.get_event_loop().call_later(
+                self.resync_timeout, self._drop_unconfirmed
+            )
         self.token = payload.token
         self.http.token = payload.token
+        self.http.resume()
+
+    def on_disconnect(self) -> None:
+        log.warning("Disconnected from the gateway")
+        self._stale = True
+        # Requests wait until the next ready instead of failing
+        self.http.pause()
+
+    def _drop_unconfirmed(self) -> None:
+        self._resync = None
+        if self._unconfirmed:
+            log.info(f"Dropping {len(self._unconfirmed)} channels that are gone")
+        for channel_id in self._unconfirmed:
+            self._remove_channel(channel_id)
+        self._unconfirmed = set()
 
     def on_channel_create(self, channel: Channel) -> None:
-        self.channels.append(channel)
+        self._unconfirmed.discard(channel.id)
+        self.state.add_channel(channel)
 
     def on_channel_delete(self, channel: Channel) -> None:
-        self.channels.remove(channel)
+        self._unconfirmed.discard(channel.id)
+        self._remove_channel(channel.id)
+
+    def _remove_channel(self, channel_id: int) -> None:
+        self.state.remove_channel(channel_id)
+        if self.history is not None:
+            self.history.remove_channel(channel_id)
+        if self.member_store is not None:
+            self.member_store.remove_channel(channel_id)
 
     def on_member_create(self, member: MemberEvent) -> None:
-        for channel in self.channels:
-            if channel.id == member.channel.id:
-                channel.members.append(member.user)
+        if self.member_store is not None:
+            self.member_store.add_member(member.channel.id, member.user)
+        else:
+            self.state.add_member(member.channel.id, member.user)
 
     def on_member_delete(self, member: MemberEvent) -> None:
-        for channel in self.channels:
-            if channel.id == member.channel.id:
-                channel.members.remove(member.user)
+        if self.member_store is not None:
+            self.member_store.remove_member(member.channel.id, member.user.id)
+        else:
+            self.state.remove_member(member.channel.id, member.user.id)
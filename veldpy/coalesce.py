@@ -0,0 +1,78 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import time
+
+from typing import Any, Callable, Dict, Hashable
+
+# Drops repeated raw events before they are parsed.
+# The first event of a key is let through, further ones with the same key
+# are dropped until window seconds have passed since the one let through.
+# Keys that were not seen for a window are forgotten, so the memory used is
+# bounded by the number of keys active within a window.
+
+
+def _typing_key(data: Dict[str, Any]) -> Hashable:
+    # Typing events are the typing user and carry no channel
+    return int(data["id"])
+
+
+class Coalescer:
+    __slots__ = ("window", "key", "clock", "_last", "_next_prune")
+
+    def __init__(
+        self,
+        window: float,
+        key: Callable[[Dict[str, Any]], Hashable] = _typing_key,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.key = key
+        self.clock = clock
+        self._last: Dict[Hashable, float] = {}
+        self._next_prune = 0.0
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def __call__(self, data: Dict[str, Any]) -> bool:
+        """Returns whether the event should be dispatched."""
+        now = self.clock()
+        if now >= self._next_prune:
+            self._prune(now)
+        key = self.key(data)
+        if (last := self._last.get(key)) is not None and now - last < self.window:
+            return False
+        self._last[key] = now
+        return True
+
+    def _prune(self, now: float) -> None:
+        expired = now - self.window
+        self._last = {key: t for key, t in self._last.items() if t > expired}
+        self._next_prune = now + self.window
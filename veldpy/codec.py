@@ -0,0 +1,125 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import json
+
+from typing import Any, Callable, Dict, Union
+
+# JSON encoding and decoding is a large part of the time spent per event.
+# A codec bundles a dumps and loads function and can be handed to socket.io
+# in place of the json module as well as to aiohttp.
+# Faster third party libraries are used if they are installed.
+
+
+class JSONCodec:
+    __slots__ = ("name", "dumps", "loads")
+
+    def __init__(
+        self,
+        name: str,
+        dumps: Callable[..., str],
+        loads: Callable[[Union[str, bytes]], Any],
+    ) -> None:
+        """
+        dumps has to return a str and accept (and may ignore)
+        the keyword arguments of json.dumps.
+        """
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self) -> str:
+        return f"<JSONCodec name={self.name!r}>"
+
+
+def _stdlib() -> JSONCodec:
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs)
+
+    return JSONCodec("json", dumps, json.loads)
+
+
+def _orjson() -> JSONCodec:
+    import orjson
+
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    return JSONCodec("orjson", dumps, orjson.loads)
+
+
+def _ujson() -> JSONCodec:
+    import ujson
+
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        return ujson.dumps(obj, ensure_ascii=False)  # type: ignore
+
+    return JSONCodec("ujson", dumps, ujson.loads)
+
+
+# In order of preference
+_codecs: Dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _orjson,
+    "ujson": _ujson,
+    "json": _stdlib,
+}
+
+
+def available_codecs() -> Dict[str, JSONCodec]:
+    """Returns all codecs that can be used in this environment."""
+    codecs = {}
+    for name, factory in _codecs.items():
+        try:
+            codecs[name] = factory()
+        except ImportError:
+            pass
+    return codecs
+
+
+def get_codec(codec: Union[str, JSONCodec, None] = None) -> JSONCodec:
+    """
+    Resolves a codec by name.
+    None picks the fastest installed one, falling back to the json module.
+    Raises ValueError for unknown names and ImportError if the library
+    for a requested codec is not installed.
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec is None:
+        for factory in _codecs.values():
+            try:
+                return factory()
+            except ImportError:
+                pass
+        # Not reached, the json module is always there
+        return _stdlib()
+    if (found := _codecs.get(codec)) is None:
+        raise ValueError(f"Unknown JSON codec {codec!r}")
+    return found()
@@ -0,0 +1,383 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import sys
+
+from array import array
+from collections import OrderedDict
+from itertools import compress
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+    overload,
+)
+
+from .models import Channel, ReadyPayload, Status, User, UserStatus
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    _HAS_NUMPY = False
+else:
+    _HAS_NUMPY = True
+
+# A struct of arrays for very large member lists.
+# Instead of a User and a UserStatus object per member, every attribute is
+# a column and a member is a row. Names are interned, statuses and the bot
+# flag take a byte each. User objects are only created when asked for, and
+# queries over a channel's members run over the columns, with numpy if it
+# is installed.
+# Like the State, rows of users that are in no channel are evicted once
+# there are too many of them, and their rows reused for new users.
+
+_STATUSES = list(Status)
+_STATUS_INDEX = {status: i for i, status in enumerate(_STATUSES)}
+
+
+class UserColumns:
+    def __init__(self, max_users: Optional[int] = 10_000) -> None:
+        """
+        max_users bounds how many users that are not a member of any
+        channel are kept, least recently added ones are evicted first.
+        None disables eviction.
+        """
+        self.max_users = max_users
+        self.ids = array("q")
+        self.names: List[str] = []
+        self.bots = bytearray()
+        self.statuses = bytearray()
+        self.status_texts: List[Optional[str]] = []
+        self.avatar_urls: List[Optional[str]] = []
+        # how many channel memberships keep a row from being evicted
+        self.refs = array("l")
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        # rows without references, in least recently added order
+        self._recent: "OrderedDict[int, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._rows
+
+    def row(self, user_id: int) -> Optional[int]:
+        return self._rows.get(user_id)
+
+    def rows(self) -> "array[int]":
+        """Returns the rows of all stored users."""
+        return array("q", sorted(self._rows.values()))
+
+    def add(self, data: Dict[str, Any]) -> int:
+        """Stores a raw user, updating it if it is known, and returns its row."""
+        id = int(data["id"])
+        status = data["status"]
+        if (row := self._rows.get(id)) is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.ids)
+                self.ids.append(id)
+                self.names.append("")
+                self.bots.append(0)
+                self.statuses.append(0)
+                self.status_texts.append(None)
+                self.avatar_urls.append(None)
+                self.refs.append(0)
+            self.ids[row] = id
+            self._rows[id] = row
+            self._recent[row] = None
+            self._evict(keep=row)
+        elif row in self._recent:
+            self._recent.move_to_end(row)
+        self.names[row] = sys.intern(data["name"])
+        self.bots[row] = data["bot"]
+        self.statuses[row] = _STATUS_INDEX[Status[status["value"].upper()]]
+        self.status_texts[row] = status.get("statusText", None)
+        self.avatar_urls[row] = data.get("avatarUrl", None)
+        return row
+
+    def add_user(self, user: User) -> int:
+        """Stores a parsed user and returns its row."""
+        return self.add(
+            {
+                "id": user.id,
+                "name": user.name,
+                "bot": user.bot,
+                "status": {
+                    "value": user.status.value.value,
+                    "statusText": user.status.status_text,
+                },
+                "avatarUrl": user.avatar_url,
+            }
+        )
+
+    def pin(self, row: int) -> None:
+        """Keeps a row until it is unpinned as often as it was pinned."""
+        if self.refs[row] == 0:
+            self._recent.pop(row, None)
+        self.refs[row] += 1
+
+    def unpin(self, row: int) -> None:
+        self.refs[row] -= 1
+        if self.refs[row] == 0:
+            self._recent[row] = None
+            self._evict()
+
+    def _evict(self, keep: Optional[int] = None) -> None:
+        if self.max_users is None:
+            return
+        while len(self._recent) > self.max_users:
+            row = next(iter(self._recent))
+            if row == keep:
+                break
+            del self._recent[row]
+            del self._rows[self.ids[row]]
+            self.status_texts[row] = self.avatar_urls[row] = None
+            self._free.append(row)
+
+    def user(self, row: int) -> User:
+        """Creates a User from a row, it is not updated with the columns."""
+        return User(
+            id=self.ids[row],
+            name=self.names[row],
+            bot=bool(self.bots[row]),
+            status=UserStatus(
+                value=_STATUSES[self.statuses[row]],
+                status_text=self.status_texts[row],
+            ),
+            avatar_url=self.avatar_urls[row],
+        )
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        if (row := self._rows.get(user_id)) is None:
+            return None
+        return self.user(row)
+
+
+class MemberStore:
+    def __init__(
+        self, columns: Optional[UserColumns] = None, max_users: Optional[int] = 10_000
+    ) -> None:
+        """
+        columns are the users, they may be shared by several stores.
+        Otherwise a new one is created with max_users, see UserColumns.
+        """
+        self.columns = columns if columns is not None else UserColumns(max_users)
+        self._channels: Dict[int, Set[int]] = {}
+        # channel id -> rows of its members, rebuilt after changes
+        self._channel_rows: Dict[int, "array[int]"] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.columns
+
+    def add(self, data: Dict[str, Any]) -> int:
+        return self.columns.add(data)
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        return self.columns.get_user(user_id)
+
+    def set_channel(self, channel_id: int, members: Iterable[Dict[str, Any]]) -> None:
+        """Replaces the members of a channel with raw users."""
+        columns = self.columns
+        rows: Set[int] = set()
+        for data in members:
+            if (row := columns.add(data)) not in rows:
+                # Pinned right away, adding the next one could evict it
+                columns.pin(row)
+                rows.add(row)
+        for row in self._channels.get(channel_id, ()):
+            columns.unpin(row)
+        self._channels[channel_id] = rows
+        self._channel_rows.pop(channel_id, None)
+
+    def add_member(self, channel_id: int, user: User) -> None:
+        row = self.columns.add_user(user)
+        members = self._channels.setdefault(channel_id, set())
+        if row not in members:
+            members.add(row)
+            self.columns.pin(row)
+            self._channel_rows.pop(channel_id, None)
+
+    def remove_member(self, channel_id: int, user_id: int) -> None:
+        row = self.columns.row(user_id)
+        members = self._channels.get(channel_id)
+        if row is not None and members is not None and row in members:
+            members.remove(row)
+            self.columns.unpin(row)
+            self._channel_rows.pop(channel_id, None)
+
+    def remove_channel(self, channel_id: int) -> None:
+        for row in self._channels.pop(channel_id, ()):
+            self.columns.unpin(row)
+        self._channel_rows.pop(channel_id, None)
+
+    def reconcile(self, user_ids: Iterable[int]) -> None:
+        """Removes channel members that are not in the ready payload."""
+        present = {self.columns.row(id) for id in user_ids}
+        for channel_id, members in self._channels.items():
+            if gone := members - present:
+                members -= gone
+                for row in gone:
+                    self.columns.unpin(row)
+                self._channel_rows.pop(channel_id, None)
+
+    def member_count(self, channel_id: int) -> int:
+        return len(self._channels.get(channel_id, ()))
+
+    def _rows_of(self, channel_id: Optional[int]) -> "array[int]":
+        if channel_id is None:
+            return self.columns.rows()
+        if (rows := self._channel_rows.get(channel_id)) is None:
+            rows = array("q", sorted(self._channels.get(channel_id, ())))
+            self._channel_rows[channel_id] = rows
+        return rows
+
+    def query(
+        self,
+        channel_id: Optional[int] = None,
+        status: Optional[Status] = None,
+        bot: Optional[bool] = None,
+    ) -> List[int]:
+        """
+        Returns the IDs of the members of a channel (or of all stored users)
+        with a status and bot flag, e.g. all online humans in a channel.
+        """
+        rows = self._rows_of(channel_id)
+        columns = self.columns
+        if _HAS_NUMPY and len(rows) > 64:
+            return self._query_numpy(rows, status, bot)
+        mask: Iterable[bool] = (True for _ in rows)
+        if status is not None:
+            wanted = _STATUS_INDEX[status]
+            statuses = columns.statuses
+            mask = [statuses[row] == wanted for row in rows]
+        if bot is not None:
+            bots = columns.bots
+            mask = [m and bots[row] == bot for m, row in zip(mask, rows)]
+        ids = columns.ids
+        return [ids[row] for row in compress(rows, mask)]
+
+    def _query_numpy(
+        self, rows: "array[int]", status: Optional[Status], bot: Optional[bool]
+    ) -> List[int]:
+        columns = self.columns
+        selected = numpy.frombuffer(rows, dtype=numpy.int64)
+        mask = numpy.ones(len(selected), dtype=bool)
+        if status is not None:
+            statuses = numpy.frombuffer(columns.statuses, dtype=numpy.uint8)
+            mask &= statuses[selected] == _STATUS_INDEX[status]
+        if bot is not None:
+            bots = numpy.frombuffer(columns.bots, dtype=numpy.uint8)
+            mask &= bots[selected] == int(bot)
+        ids = numpy.frombuffer(columns.ids, dtype=numpy.int64)
+        return ids[selected[mask]].tolist()  # type: ignore
+
+    def users(
+        self,
+        channel_id: Optional[int] = None,
+        status: Optional[Status] = None,
+        bot: Optional[bool] = None,
+    ) -> List[User]:
+        """Like query, but creates User objects."""
+        columns = self.columns
+        return [
+            user
+            for id in self.query(channel_id, status, bot)
+            if (user := columns.get_user(id)) is not None
+        ]
+
+
+class MemberView(Sequence[User]):
+    """
+    The members of a ready payload, a User is parsed for every access.
+    They are not cached, use the member store for lookups.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: List[Dict[str, Any]]) -> None:
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @overload
+    def __getitem__(self, index: int) -> User:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "MemberView":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[User, "MemberView"]:
+        if isinstance(index, slice):
+            return MemberView(self.data[index])
+        return User.from_dict(self.data[index])
+
+    def __iter__(self) -> Iterator[User]:
+        return (User.from_dict(data) for data in self.data)
+
+    def ids(self) -> Iterator[int]:
+        return (int(data["id"]) for data in self.data)
+
+
+def parse_ready(store: MemberStore, data: Dict[str, Any]) -> ReadyPayload:
+    """
+    Parses a ready payload into a store.
+    Its members are a MemberView instead of a list of users.
+    """
+    for member in data["members"]:
+        store.add(member)
+    return ReadyPayload(
+        user=User.from_dict(data["user"]),
+        members=MemberView(data["members"]),  # type: ignore
+        token=data["token"],
+    )
+
+
+def parse_channel(store: Optional[MemberStore], data: Dict[str, Any]) -> Channel:
+    """
+    Parses a channel, its members are added to the store if one is passed.
+    The channel's member list is empty, they are kept in the store only.
+    """
+    channel = Channel(id=int(data["id"]), name=data["name"])
+    if store is not None:
+        store.set_channel(channel.id, data.get("members", []))
+    return channel
@@ -0,0 +1,208 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import inspect
+import logging
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional, Sequence, Set, Tuple
+
+from .events import GatewayEvent
+from .metrics import Metrics
+from .models import slotted
+
+# The dispatcher runs coroutine listeners on a fixed number of workers per
+# event type instead of spawning a task for every event. Jobs that cannot
+# be started right away wait in a bounded queue, what happens once it is
+# full is decided by the overflow policy of the event.
+# Plain functions are still called right away, in the order of events.
+# There is no policy that makes the caller wait, socket.io handles every
+# packet in its own task, so waiting would not stop the socket from reading
+# and only park the events somewhere else.
+
+log = logging.getLogger(__name__)
+
+ErrorHandler = Callable[[GatewayEvent, BaseException], Any]
+Job = Tuple[Callable[..., Any], Tuple[Any, ...]]
+
+
+class Overflow(Enum):
+    # Drops the oldest queued job to make room
+    DROP_OLDEST = "drop_oldest"
+    # Drops the new job
+    REJECT = "reject"
+
+
+@slotted
+@dataclass
+class DispatchPolicy:
+    workers: int = 8
+    max_queue: int = 1000
+    overflow: Overflow = Overflow.DROP_OLDEST
+
+
+class QueueFull(Exception):
+    """Raised to the error handler when a job was dropped."""
+
+    pass
+
+
+class _Lane:
+    __slots__ = ("policy", "jobs", "workers")
+
+    def __init__(self, policy: DispatchPolicy) -> None:
+        self.policy = policy
+        self.jobs: Deque[Job] = deque()
+        self.workers: Set[asyncio.Task[None]] = set()
+
+
+def _passthrough(result: Any) -> Any:
+    return result
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        default: Optional[DispatchPolicy] = None,
+        policies: Optional[Dict[GatewayEvent, DispatchPolicy]] = None,
+        on_error: Optional[ErrorHandler] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """
+        default is the policy for events that have none in policies.
+        on_error is called with the event and the exception when a listener
+        fails or a job is dropped.
+        metrics records how long listeners take and how many jobs are dropped.
+        """
+        self.default = default if default is not None else DispatchPolicy()
+        self.policies = policies if policies is not None else {}
+        self.on_error = on_error
+        self.metrics = metrics
+        self._lanes: Dict[GatewayEvent, _Lane] = {}
+
+    def _lane(self, event: GatewayEvent) -> _Lane:
+        if (lane := self._lanes.get(event)) is None:
+            lane = self._lanes[event] = _Lane(self.policies.get(event, self.default))
+        return lane
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return sum(len(lane.jobs) for lane in self._lanes.values())
+
+    @property
+    def running(self) -> int:
+        """Number of jobs being run by a worker right now."""
+        return sum(len(lane.workers) for lane in self._lanes.values())
+
+    def report(self, event: GatewayEvent, exc: BaseException) -> None:
+        if self.on_error is None:
+            log.error(f"Exception in listener for {event}", exc_info=exc)
+            return
+        try:
+            self.on_error(event, exc)
+        except Exception:
+            log.exception("Exception in error handler")
+
+    def submit(
+        self,
+        event: GatewayEvent,
+        callbacks: Sequence[Callable[..., Any]],
+        args: Tuple[Any, ...],
+    ) -> None:
+        """Calls plain callbacks and queues coroutine functions."""
+        lane = self._lane(event)
+        for callback in callbacks:
+            if not asyncio.iscoroutinefunction(callback):
+                start = time.perf_counter()
+                try:
+                    result = callback(*args)
+                except Exception as e:
+                    self.report(event, e)
+                    continue
+                finally:
+                    self._observe(event, start)
+                if inspect.isawaitable(result):
+                    self._enqueue(event, lane, (_passthrough, (result,)))
+                continue
+            self._enqueue(event, lane, (callback, args))
+
+    def _enqueue(self, event: GatewayEvent, lane: _Lane, job: Job) -> None:
+        policy = lane.policy
+        if len(lane.jobs) >= policy.max_queue:
+            if policy.overflow is Overflow.REJECT:
+                self._drop(event, job)
+                return
+            self._drop(event, lane.jobs.popleft())
+        lane.jobs.append(job)
+        self._wake(event, lane)
+
+    def _drop(self, event: GatewayEvent, job: Job) -> None:
+        # Listeners that returned an awaitable already created a coroutine
+        for arg in job[1]:
+            if inspect.iscoroutine(arg):
+                arg.close()
+        if self.metrics is not None:
+            self.metrics.inc("veldpy_dispatcher_dropped_total", event=event.value)
+        self.report(event, QueueFull(f"Dropped a job for {event}, queue is full"))
+
+    def _observe(self, event: GatewayEvent, start: float) -> None:
+        if self.metrics is not None:
+            self.metrics.observe(
+                "veldpy_listener_seconds",
+                time.perf_counter() - start,
+                event=event.value,
+            )
+
+    def _wake(self, event: GatewayEvent, lane: _Lane) -> None:
+        # Workers exit once the queue is empty, so start one if there is room
+        if len(lane.workers) < lane.policy.workers:
+            lane.workers.add(asyncio.create_task(self._work(event, lane)))
+
+    async def _work(self, event: GatewayEvent, lane: _Lane) -> None:
+        try:
+            while lane.jobs:
+                callback, args = lane.jobs.popleft()
+                start = time.perf_counter()
+                try:
+                    result = callback(*args)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    self.report(event, e)
+                finally:
+                    self._observe(event, start)
+        finally:
+            # Not in a done callback, a job queued before that ran would
+            # otherwise find no free worker and no worker to pick it up
+            lane.workers.discard(asyncio.current_task())
@@ -33,10 +33,11 @@ from enum import Enum
 class GatewayEvent(Enum):
     """
     An enumeration of gateway events
-    and the CONNECT event from socket.io
+    and the CONNECT and DISCONNECT events from socket.io
     """
 
     CONNECT = "connect"
+    DISCONNECT = "disconnect"
     MESSAGE_CREATE = "message:create"
     MEMBER_CREATE = "member:create"
     MEMBER_DELETE = "member:delete"
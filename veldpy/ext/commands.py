@@ -0,0 +1,379 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import inspect
+import logging
+import time
+
+from enum import Enum
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    get_type_hints,
+)
+
+from ..client import Client
+from ..events import GatewayEvent
+from ..filters import make_filter
+from ..models import Message
+
+# A small command framework on top of Client.
+# Messages are filtered by prefix before they are parsed, prefixes are
+# indexed by their first character and commands by name, so finding the
+# command for a message does not depend on how many there are.
+# How arguments are converted is worked out once when a command is added.
+#
+#     router = Router(client, prefix="!")
+#
+#     @router.command(cooldown=Cooldown(1, 5.0), max_concurrency=1)
+#     async def add(ctx: Context, a: int, b: int) -> None:
+#         await ctx.reply(str(a + b))
+
+log = logging.getLogger(__name__)
+
+Converter = Callable[[str], Any]
+CommandCallback = Callable[..., Awaitable[Any]]
+
+
+class CommandError(Exception):
+    """Base exception for everything that can go wrong running a command."""
+
+    pass
+
+
+class BadArgument(CommandError):
+    """Raised when an argument is missing or could not be converted."""
+
+    pass
+
+
+class CommandOnCooldown(CommandError):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"On cooldown, retry in {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+class MaxConcurrencyReached(CommandError):
+    """Raised when too many invocations of a command are running."""
+
+    pass
+
+
+class BucketType(Enum):
+    GLOBAL = "global"
+    USER = "user"
+    CHANNEL = "channel"
+
+    def key(self, message: Message) -> int:
+        if self is BucketType.USER:
+            return message.user.id
+        if self is BucketType.CHANNEL:
+            return message.channel.id
+        return 0
+
+
+class Cooldown:
+    def __init__(
+        self, rate: int, per: float, bucket: BucketType = BucketType.USER
+    ) -> None:
+        """Allows rate invocations every per seconds in each bucket."""
+        self.rate = rate
+        self.per = per
+        self.bucket = bucket
+        # bucket key -> (start of the window, invocations in it)
+        self._windows: Dict[int, Tuple[float, int]] = {}
+
+    def update(self, message: Message) -> float:
+        """Counts an invocation, returns how long to wait if it is not allowed."""
+        now = time.monotonic()
+        key = self.bucket.key(message)
+        start, count = self._windows.get(key, (now, 0))
+        if now - start >= self.per:
+            start, count = now, 0
+        if count >= self.rate:
+            return self.per - (now - start)
+        self._windows[key] = (start, count + 1)
+        if len(self._windows) > 10_000:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float) -> None:
+        for key, (start, _) in list(self._windows.items()):
+            if now - start >= self.per:
+                del self._windows[key]
+
+
+class Concurrency:
+    def __init__(self, limit: int, bucket: BucketType = BucketType.GLOBAL) -> None:
+        """Allows limit invocations to run at once in each bucket."""
+        self.limit = limit
+        self.bucket = bucket
+        self._running: Dict[int, int] = {}
+
+    def acquire(self, message: Message) -> int:
+        key = self.bucket.key(message)
+        running = self._running.get(key, 0)
+        if running >= self.limit:
+            raise MaxConcurrencyReached(f"At most {self.limit} may run at once")
+        self._running[key] = running + 1
+        return key
+
+    def release(self, key: int) -> None:
+        if (running := self._running[key] - 1) > 0:
+            self._running[key] = running
+        else:
+            del self._running[key]
+
+
+def _to_bool(argument: str) -> bool:
+    lowered = argument.lower()
+    if lowered in ("yes", "y", "true", "t", "1", "on"):
+        return True
+    if lowered in ("no", "n", "false", "f", "0", "off"):
+        return False
+    raise ValueError(f"{argument!r} is not a boolean")
+
+
+_CONVERTERS: Dict[Any, Converter] = {
+    str: str,
+    int: int,
+    float: float,
+    bool: _to_bool,
+}
+
+
+class _Param:
+    __slots__ = ("name", "convert", "kind", "default")
+
+    def __init__(self, parameter: inspect.Parameter, convert: Converter) -> None:
+        self.name = parameter.name
+        self.convert = convert
+        self.kind = parameter.kind
+        self.default = parameter.default
+
+
+class Context:
+    __slots__ = ("client", "message", "prefix", "command", "invoked_with")
+
+    def __init__(
+        self,
+        client: Client,
+        message: Message,
+        prefix: str,
+        command: "Command",
+        invoked_with: str,
+    ) -> None:
+        self.client = client
+        self.message = message
+        self.prefix = prefix
+        self.command = command
+        self.invoked_with = invoked_with
+
+    async def reply(self, content: str) -> bool:
+        """Sends a message to the channel the command was invoked in."""
+        return await self.client.http.send_message(self.message.channel.id, content)
+
+
+class Command:
+    def __init__(
+        self,
+        callback: CommandCallback,
+        name: Optional[str] = None,
+        aliases: Iterable[str] = (),
+        cooldown: Optional[Cooldown] = None,
+        max_concurrency: Union[int, Concurrency, None] = None,
+    ) -> None:
+        if not asyncio.iscoroutinefunction(callback):
+            raise TypeError("Command callbacks must be coroutine functions")
+        self.callback = callback
+        self.name = name or callback.__name__
+        self.aliases = tuple(aliases)
+        self.cooldown = cooldown
+        if isinstance(max_concurrency, int):
+            max_concurrency = Concurrency(max_concurrency)
+        self.concurrency = max_concurrency
+        self.params = self._build_params(callback)
+
+    @staticmethod
+    def _build_params(callback: CommandCallback) -> List[_Param]:
+        hints = get_type_hints(callback)
+        # The first parameter is the context
+        parameters = list(inspect.signature(callback).parameters.values())[1:]
+        params = []
+        for parameter in parameters:
+            annotation = hints.get(parameter.name, str)
+            params.append(_Param(parameter, _CONVERTERS.get(annotation, annotation)))
+        return params
+
+    def parse(self, argument: str) -> Tuple[List[Any], Dict[str, Any]]:
+        """Splits and converts the text after the command name."""
+        args: List[Any] = []
+        kwargs: Dict[str, Any] = {}
+        rest = argument.strip()
+        for param in self.params:
+            if param.kind is inspect.Parameter.KEYWORD_ONLY:
+                # Consumes the rest of the message
+                if rest:
+                    kwargs[param.name] = self._convert(param, rest)
+                elif param.default is inspect.Parameter.empty:
+                    raise BadArgument(f"{param.name} is a required argument")
+                break
+            if param.kind is inspect.Parameter.VAR_POSITIONAL:
+                args.extend(self._convert(param, word) for word in rest.split())
+                break
+            if not rest:
+                if param.default is inspect.Parameter.empty:
+                    raise BadArgument(f"{param.name} is a required argument")
+                args.append(param.default)
+                continue
+            word, *remaining = rest.split(None, 1)
+            rest = remaining[0] if remaining else ""
+            args.append(self._convert(param, word))
+        return args, kwargs
+
+    @staticmethod
+    def _convert(param: _Param, argument: str) -> Any:
+        try:
+            return param.convert(argument)
+        except Exception as e:
+            raise BadArgument(f"Converting {param.name} failed: {e}") from e
+
+    async def invoke(self, ctx: Context, argument: str) -> None:
+        if self.cooldown is not None:
+            if retry_after := self.cooldown.update(ctx.message):
+                raise CommandOnCooldown(retry_after)
+        args, kwargs = self.parse(argument)
+        if self.concurrency is None:
+            await self.callback(ctx, *args, **kwargs)
+            return
+        key = self.concurrency.acquire(ctx.message)
+        try:
+            await self.callback(ctx, *args, **kwargs)
+        finally:
+            self.concurrency.release(key)
+
+
+class Router:
+    def __init__(
+        self,
+        client: Client,
+        prefix: Union[str, Iterable[str]],
+        ignore_bots: bool = True,
+        case_insensitive: bool = False,
+    ) -> None:
+        """
+        Registers a message listener on client that runs the commands
+        of this router. Messages that don't start with a prefix (or are
+        sent by a bot, if ignore_bots) are never parsed.
+        """
+        self.client = client
+        prefixes = (prefix,) if isinstance(prefix, str) else tuple(prefix)
+        if not prefixes or not all(prefixes):
+            raise ValueError("Prefixes must not be empty")
+        self.prefixes = prefixes
+        self.case_insensitive = case_insensitive
+        # first character -> prefixes starting with it, longest first
+        self._prefixes: Dict[str, List[str]] = {}
+        for p in sorted(prefixes, key=len, reverse=True):
+            self._prefixes.setdefault(p[0], []).append(p)
+        self.commands: Dict[str, Command] = {}
+        raw_filter = make_filter(
+            GatewayEvent.MESSAGE_CREATE,
+            bot=False if ignore_bots else None,
+            prefix=prefixes,
+        )
+        client.add_listener(
+            GatewayEvent.MESSAGE_CREATE, self.process_commands, raw_filter=raw_filter
+        )
+
+    def add_command(self, command: Command) -> None:
+        for name in (command.name, *command.aliases):
+            if self.case_insensitive:
+                name = name.lower()
+            if name in self.commands:
+                raise ValueError(f"A command named {name!r} already exists")
+            self.commands[name] = command
+
+    def command(
+        self,
+        name: Optional[str] = None,
+        aliases: Iterable[str] = (),
+        cooldown: Optional[Cooldown] = None,
+        max_concurrency: Union[int, Concurrency, None] = None,
+    ) -> Callable[[CommandCallback], Command]:
+        """Decorator that turns a coroutine function into a command."""
+
+        def inner(func: CommandCallback) -> Command:
+            command = Command(func, name, aliases, cooldown, max_concurrency)
+            self.add_command(command)
+            return command
+
+        return inner
+
+    def get_prefix(self, content: str) -> Optional[str]:
+        if not content:
+            return None
+        for prefix in self._prefixes.get(content[0], ()):
+            if content.startswith(prefix):
+                return prefix
+        return None
+
+    async def process_commands(self, message: Message) -> None:
+        content = message.content
+        if content is None or (prefix := self.get_prefix(content)) is None:
+            return
+        invoked_with, *remaining = content[len(prefix) :].split(None, 1) or [""]
+        argument = remaining[0] if remaining else ""
+        if self.case_insensitive:
+            invoked_with = invoked_with.lower()
+        if (command := self.commands.get(invoked_with)) is None:
+            return
+        ctx = Context(self.client, message, prefix, command, invoked_with)
+        try:
+            await command.invoke(ctx, argument)
+        except Exception as e:
+            await self.on_command_error(ctx, e)
+
+    async def on_command_error(self, ctx: Context, exc: Exception) -> None:
+        """
+        Called when a command failed. Errors of the command itself are
+        logged, override this to handle them yourself.
+        """
+        if isinstance(exc, CommandError):
+            log.debug(f"Command {ctx.command.name} failed: {exc}")
+        else:
+            log.error(f"Exception in command {ctx.command.name}", exc_info=exc)
@@ -0,0 +1,105 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .events import GatewayEvent
+
+# Filters that run on the raw event data before it is parsed.
+# Listeners whose filter rejects an event are skipped, and if no listener
+# is left the event is never parsed at all.
+
+RawFilter = Callable[[Dict[str, Any]], bool]
+
+_USER_EVENTS = (
+    GatewayEvent.MESSAGE_CREATE,
+    GatewayEvent.MEMBER_CREATE,
+    GatewayEvent.MEMBER_DELETE,
+)
+_CHANNEL_EVENTS = (GatewayEvent.CHANNEL_CREATE, GatewayEvent.CHANNEL_DELETE)
+
+
+def _user(event: GatewayEvent) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    if event in _USER_EVENTS:
+        return lambda data: data["user"]
+    if event is GatewayEvent.MEMBER_TYPING:
+        return lambda data: data
+    raise ValueError(f"{event} has no user to filter on")
+
+
+def _channel_id(event: GatewayEvent) -> Callable[[Dict[str, Any]], int]:
+    if event in _USER_EVENTS:
+        return lambda data: int(data["channel"]["id"])
+    if event in _CHANNEL_EVENTS:
+        return lambda data: int(data["id"])
+    raise ValueError(f"{event} has no channel to filter on")
+
+
+def make_filter(
+    event: GatewayEvent,
+    bot: Optional[bool] = None,
+    prefix: Union[str, Tuple[str, ...], None] = None,
+    channels: Optional[Iterable[int]] = None,
+) -> Optional[RawFilter]:
+    """
+    Builds a filter for the raw data of an event.
+    bot only lets events by bots (True) or humans (False) through, prefix
+    only messages whose content starts with it (or one of them) and
+    channels only events in these channel IDs.
+    Returns None if nothing is filtered. Raises ValueError if the event
+    does not have a field that is filtered on.
+    """
+    checks: List[RawFilter] = []
+    if bot is not None:
+        get_user = _user(event)
+        checks.append(lambda data: get_user(data)["bot"] is bot)
+    if prefix is not None:
+        if event is not GatewayEvent.MESSAGE_CREATE:
+            raise ValueError(f"{event} has no content to filter on")
+        checks.append(lambda data: (data.get("content") or "").startswith(prefix))
+    if channels is not None:
+        get_channel_id = _channel_id(event)
+        channel_ids: FrozenSet[int] = frozenset(channels)
+        checks.append(lambda data: get_channel_id(data) in channel_ids)
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    return lambda data: all(check(data) for check in checks)
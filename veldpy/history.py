@@ -0,0 +1,101 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .lazy import LazyMessage
+from .models import Message
+
+# Recently created messages, kept per channel.
+# Every channel holds at most per_channel messages and all channels together
+# at most max_messages, the oldest ones are dropped first. The number of
+# messages is what bounds the memory used, lazy messages are decoded when
+# they are added so that they do not keep their raw data alive.
+
+
+class MessageHistory:
+    def __init__(self, per_channel: int = 100, max_messages: int = 10_000) -> None:
+        self.per_channel = per_channel
+        self.max_messages = max_messages
+        # All messages, oldest first
+        self._messages: "OrderedDict[int, Message]" = OrderedDict()
+        self._channels: Dict[int, "OrderedDict[int, Message]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._messages
+
+    def add(self, message: Message) -> None:
+        if message.id in self._messages:
+            return
+        if isinstance(message, LazyMessage):
+            message.materialize()
+        channel_id = message.channel.id
+        if (channel := self._channels.get(channel_id)) is None:
+            channel = self._channels[channel_id] = OrderedDict()
+        channel[message.id] = message
+        self._messages[message.id] = message
+        if len(channel) > self.per_channel:
+            oldest, _ = channel.popitem(last=False)
+            del self._messages[oldest]
+        while len(self._messages) > self.max_messages:
+            oldest, evicted = self._messages.popitem(last=False)
+            self._remove_from_channel(evicted.channel.id, oldest)
+
+    def _remove_from_channel(self, channel_id: int, message_id: int) -> None:
+        channel = self._channels[channel_id]
+        del channel[message_id]
+        if not channel:
+            del self._channels[channel_id]
+
+    def get(self, message_id: int) -> Optional[Message]:
+        return self._messages.get(message_id)
+
+    def channel(self, channel_id: int, limit: Optional[int] = None) -> List[Message]:
+        """Returns the messages of a channel, newest last."""
+        messages = list(self._channels.get(channel_id, {}).values())
+        if limit is not None:
+            messages = messages[-limit:] if limit > 0 else []
+        return messages
+
+    def remove(self, message_id: int) -> Optional[Message]:
+        if (message := self._messages.pop(message_id, None)) is not None:
+            self._remove_from_channel(message.channel.id, message_id)
+        return message
+
+    def remove_channel(self, channel_id: int) -> None:
+        for message_id in self._channels.pop(channel_id, {}):
+            del self._messages[message_id]
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._channels.clear()
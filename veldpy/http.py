@@ -27,44 +27,277 @@ CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
+import asyncio
 import logging
+import re
+import time
 
-from typing import Any, Dict, Optional
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
 
 # https://chat-gateway.veld.dev/swagger/
 import aiohttp
 
-from .models import Channel, Embed, Message
+from .codec import JSONCodec, get_codec
+from .metrics import Metrics
+from .models import Channel, Embed
+from .ratelimit import RateLimiter
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+R = TypeVar("R")
+
+BASE_URL = "https://chat-gateway.veld.dev/api/v1"
+
+# Replaces IDs in routes to keep the number of metric labels bounded
+_ID = re.compile(r"/\d+")
+
+# Methods that can be sent twice without creating something twice
+_IDEMPOTENT = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE"))
+
 
 class HTTPException(Exception):
     """Generic exception when a HTTP operation failed."""
 
+    def __init__(self, status: int, body: str) -> None:
+        super().__init__(f"HTTP Response code {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+class BufferFull(Exception):
+    """Raised when too many requests wait for the connection to come back."""
+
+    pass
+
+
+class ConnectionLost(Exception):
+    """
+    Raised when a request waited for the connection to come back, but the
+    client was closed or it took too long.
+    """
+
     pass
 
 
 class HTTPClient:
-    def __init__(self) -> None:
-        self.session = aiohttp.ClientSession()
+    def __init__(
+        self,
+        codec: Union[str, JSONCodec, None] = None,
+        ratelimiter: Optional[RateLimiter] = None,
+        base_url: str = BASE_URL,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        ttl_dns_cache: Optional[int] = 300,
+        timeout: Optional[float] = 30.0,
+        connect_timeout: Optional[float] = 10.0,
+        metrics: Optional[Metrics] = None,
+        max_buffered: int = 1000,
+        buffer_timeout: Optional[float] = 60.0,
+        connector: Optional[aiohttp.BaseConnector] = None,
+    ) -> None:
+        """
+        limit and limit_per_host bound the number of pooled connections,
+        0 means no limit. Idle connections are kept alive for
+        keepalive_timeout seconds and DNS lookups cached for ttl_dns_cache
+        seconds. timeout is the total time a request may take.
+        The session is only created once the first request is made.
+        metrics records the latency and status of every request per route.
+        max_buffered is how many requests may wait while the client is
+        paused, e.g. during a gateway outage, for at most buffer_timeout
+        seconds each.
+        connector is a connection pool shared with other clients, it is
+        not closed with this client and the pool options above are ignored.
+        """
+        self.codec = get_codec(codec)
         self.token: Optional[str] = None
+        self.ratelimiter = ratelimiter if ratelimiter is not None else RateLimiter()
+        self.base_url = base_url.rstrip("/")
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.connector = connector
+        self.metrics = metrics
+        self.max_buffered = max_buffered
+        self.buffer_timeout = buffer_timeout
+        self.buffered = 0
+        self._paused = False
+        self._resumed: Optional[asyncio.Future[None]] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The aiohttp session, created in the running event loop on first use."""
+        if self._session is None or self._session.closed:
+            connector = self.connector
+            if connector is None:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=self.ttl_dns_cache,
+                )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                connector_owner=self.connector is None,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.timeout, connect=self.connect_timeout
+                ),
+                json_serialize=self.codec.dumps,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Closes the session and all pooled connections.
+        Requests waiting while paused fail with ConnectionLost.
+        """
+        if self._resumed is not None:
+            if self.buffered:
+                self._resumed.set_exception(ConnectionLost("The client was closed"))
+            self._resumed = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a ratelimit to reset."""
+        return self.ratelimiter.queue_depth
+
+    def pause(self) -> None:
+        """Makes new requests wait until resume is called."""
+        self._paused = True
+
+    def resume(self) -> None:
+        """Sends the requests that waited while paused."""
+        self._paused = False
+        if self._resumed is not None:
+            self._resumed.set_result(None)
+            self._resumed = None
+
+    async def _wait_until_resumed(self) -> None:
+        if self.buffered >= self.max_buffered:
+            raise BufferFull(f"{self.buffered} requests are already waiting")
+        if self._resumed is None:
+            self._resumed = asyncio.get_event_loop().create_future()
+        resumed = self._resumed
+        self.buffered += 1
+        try:
+            # Shielded, a timeout must not cancel it for the other requests
+            await asyncio.wait_for(asyncio.shield(resumed), self.buffer_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionLost(
+                f"Not reconnected within {self.buffer_timeout} seconds"
+            ) from None
+        finally:
+            self.buffered -= 1
+
+    async def request(
+        self,
+        method: str,
+        route: str,
+        expected_status: int = 200,
+        json: Optional[Dict[str, Any]] = None,
+        data: Optional[bytes] = None,
+        retry_errors: Optional[bool] = None,
+    ) -> Any:
+        """
+        Sends a request to the API once the ratelimit bucket of the route
+        allows it. Routes only contain major parameters, so they are used
+        as the bucket.
+        data is an already encoded JSON body and sent instead of json.
+        Ratelimited requests and failed connection attempts are retried with
+        backoff. Server errors and connections lost after sending are only
+        retried if retry_errors is True, by default for idempotent methods,
+        since the server may have handled the request already.
+        Returns the decoded body, or None for empty responses.
+        """
+        if retry_errors is None:
+            retry_errors = method in _IDEMPOTENT
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        ratelimiter = self.ratelimiter
+        ratelimit_bucket = ratelimiter.get_bucket(f"{method} {route}")
+        attempt = 0
+        while True:
+            if self._paused:
+                await self._wait_until_resumed()
+            await ratelimit_bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = await self.session.request(
+                    method,
+                    f"{self.base_url}{route}",
+                    json=json,
+                    data=data,
+                    headers=headers,
+                )
+            except aiohttp.ClientConnectionError as e:
+                # Only connecting failed, the request was never sent
+                unsent = isinstance(e, aiohttp.ClientConnectorError)
+                if not (unsent or retry_errors) or attempt >= ratelimiter.max_retries:
+                    raise
+                delay = ratelimiter.retry_delay(attempt, {})
+                log.warning(f"{method} {route} failed: {e!r}, retrying in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            async with response as req:
+                ratelimit_bucket.update(req.headers)
+                if self.metrics is not None:
+                    self._observe(method, route, req.status, start)
+                if req.status == expected_status:
+                    if req.status == 204:
+                        return None
+                    return await req.json(loads=self.codec.loads)
+                body = await req.text()
+                log.debug(f"HTTP Response code {req.status}, body is {body}")
+                retry = req.status == 429 or (req.status >= 500 and retry_errors)
+                if not retry or attempt >= ratelimiter.max_retries:
+                    raise HTTPException(req.status, body)
+                delay = ratelimiter.retry_delay(attempt, req.headers)
+            attempt += 1
+            if req.status == 429:
+                log.warning(
+                    f"Ratelimited on {method} {route}, retrying in {delay:.2f}s"
+                )
+                ratelimit_bucket.block(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    def _observe(self, method: str, route: str, status: int, start: float) -> None:
+        assert self.metrics is not None
+        labels = {
+            "method": method,
+            "route": _ID.sub("/{id}", route),
+            "status": str(status),
+        }
+        self.metrics.observe(
+            "veldpy_http_request_seconds", time.perf_counter() - start, **labels
+        )
 
     # /api/v1/channels
     async def create_channel(self, name: str) -> Channel:
         """
         Creates a new channel.
         """
-        async with self.session.post(
-            "https://chat-gateway.veld.dev/api/v1/channels",
-            json={"name": name},
-            headers={"Authorization": f"Bearer {self.token}"},
-        ) as req:
-            if req.status != 200:
-                body = await req.text()
-                log.debug(f"HTTP Response code {req.status}, body is {body}")
-                raise HTTPException()
-            json = await req.json()
+        json = await self.request("POST", "/channels", json={"name": name})
         return Channel.from_dict(json)
 
     # /api/v1/channels/id/join
@@ -72,39 +305,105 @@ class HTTPClient:
         """
         Joins a channel
         """
-        async with self.session.post(
-            f"https://chat-gateway.veld.dev/api/v1/channels/{channel_id}/join",
-            headers={"Authorization": f"Bearer {self.token}"},
-        ) as req:
-            if req.status != 204:
-                body = await req.text()
-                log.debug(f"HTTP Response code {req.status}, body is {body}")
-                raise HTTPException()
+        await self.request(
+            "POST",
+            f"/channels/{channel_id}/join",
+            expected_status=204,
+            retry_errors=True,
+        )
         return True
 
+    async def bulk(
+        self,
+        func: Callable[[T], Awaitable[R]],
+        items: Iterable[T],
+        concurrency: int = 10,
+    ) -> List[Union[R, Exception]]:
+        """
+        Calls func for every item with at most concurrency calls at once.
+        Returns the results in the order of items, failed calls give
+        their exception instead of aborting the others.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        items = list(items)
+        results: List[Union[R, Exception]] = [None] * len(items)  # type: ignore
+        indices = iter(range(len(items)))
+
+        async def worker() -> None:
+            for i in indices:
+                try:
+                    results[i] = await func(items[i])
+                except Exception as e:
+                    results[i] = e
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(items)))))
+        return results
+
+    async def join_channels(
+        self, channel_ids: Iterable[int], concurrency: int = 10
+    ) -> List[Union[bool, Exception]]:
+        """Joins many channels concurrently, see bulk."""
+        return await self.bulk(self.join_channel, channel_ids, concurrency)
+
+    async def create_channels(
+        self, names: Iterable[str], concurrency: int = 10
+    ) -> List[Union[Channel, Exception]]:
+        """Creates many channels concurrently, see bulk."""
+        return await self.bulk(self.create_channel, names, concurrency)
+
     # /api/v1/channels/id/messages
     async def send_message(
         self,
         channel_id: int,
         content: Optional[str] = None,
         embed: Optional[Embed] = None,
-    ) -> Message:
+    ) -> bool:
         """
         Sends a message to a channel
         """
+        data = self._message_payload(content, embed)
+        await self.request(
+            "POST",
+            f"/channels/{channel_id}/messages",
+            expected_status=204,
+            json=data,
+        )
+        return True
+
+    async def broadcast(
+        self,
+        channel_ids: Iterable[int],
+        content: Optional[str] = None,
+        embed: Optional[Embed] = None,
+        concurrency: int = 10,
+    ) -> List[Union[bool, Exception]]:
+        """
+        Sends the same message to many channels with at most concurrency
+        requests at once. The body is encoded only once for all of them.
+        Returns True or the exception for every channel, in order.
+        """
+        body = self.codec.dumps(self._message_payload(content, embed)).encode()
+
+        async def send(channel_id: int) -> bool:
+            await self.request(
+                "POST",
+                f"/channels/{channel_id}/messages",
+                expected_status=204,
+                data=body,
+            )
+            return True
+
+        return await self.bulk(send, channel_ids, concurrency)
+
+    @staticmethod
+    def _message_payload(
+        content: Optional[str], embed: Optional[Embed]
+    ) -> Dict[str, Any]:
         if content is None and embed is None:
             raise ValueError("Either content or embed must be supplied")
 
         data: Dict[str, Any] = {"content": content}
         if embed is not None:
             data["embed"] = embed.to_dict()
-        async with self.session.post(
-            f"https://chat-gateway.veld.dev/api/v1/channels/{channel_id}/messages",
-            json=data,
-            headers={"Authorization": f"Bearer {self.token}"},
-        ) as req:
-            if req.status != 204:
-                body = await req.text()
-                log.debug(f"HTTP Response code {req.status}, body is {body}")
-                raise HTTPException()
-        return Message.from_dict(data)
+        return data
@@ -0,0 +1,226 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from __future__ import annotations
+
+from dataclasses import fields
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    cast,
+)
+
+from .models import Channel, Embed, MemberEvent, Message, User, UserStatus
+
+if TYPE_CHECKING:
+    from .state import State
+
+# Lazy variants of the models that are expensive to parse.
+# They are subclasses of the regular models, but only decode the cheap scalar
+# fields up front. Nested fields are decoded on first access and stored in the
+# slot of the parent class, so every further access is a plain slot read.
+# Pickled, e.g. for a process pool, they turn into the regular models, the
+# raw data and the state they keep for decoding are left behind.
+
+T = TypeVar("T")
+
+
+class lazy(Generic[T]):
+    """
+    Descriptor that decodes a field of a slotted model on first access.
+    """
+
+    def __init__(self, owner: Type[Any], name: str, decode: Callable[[Any], T]):
+        self.slot = owner.__dict__[name]
+        self.decode = decode
+
+    def __get__(self, instance: Any, owner: Type[Any]) -> T:
+        if instance is None:
+            return self  # type: ignore
+        try:
+            return self.slot.__get__(instance, owner)  # type: ignore
+        except AttributeError:
+            value = self.decode(instance)
+            self.slot.__set__(instance, value)
+            return value
+
+    def __set__(self, instance: Any, value: T) -> None:
+        self.slot.__set__(instance, value)
+
+    def reset(self, instance: Any) -> None:
+        """Forgets the decoded value so that it is decoded again."""
+        try:
+            self.slot.__delete__(instance)
+        except AttributeError:
+            pass
+
+
+def _as_plain(cls: Type[Any], instance: Any) -> Tuple[Any, Tuple[Any, ...]]:
+    return cls, tuple(getattr(instance, f.name) for f in fields(cls))
+
+
+def _decode_status(user: LazyUser) -> UserStatus:
+    assert user._raw_status is not None
+    status = UserStatus.from_dict(user._raw_status)
+    user._raw_status = None
+    return status
+
+
+class LazyUser(User):
+    __slots__ = ("_raw_status",)
+    _raw_status: Optional[Dict[str, Any]]
+
+    status = lazy(User, "status", _decode_status)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> User:
+        id = int(data["id"])
+        if state is not None and (user := state.get_user(id)) is not None:
+            user._update(data)
+            return user
+        user = cls.__new__(cls)
+        user.id = id
+        user.name = data["name"]
+        user.bot = data["bot"]
+        user.avatar_url = data.get("avatarUrl", None)
+        user._raw_status = data["status"]
+        if state is not None:
+            state.store_user(user)
+        return user
+
+    def _update(self, data: Dict[str, Any]) -> None:
+        self.name = data["name"]
+        self.bot = data["bot"]
+        self.avatar_url = data.get("avatarUrl", None)
+        cast("lazy[UserStatus]", LazyUser.__dict__["status"]).reset(self)
+        self._raw_status = data["status"]
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        return _as_plain(User, self)
+
+
+def _decode_members(channel: LazyChannel) -> List[User]:
+    members = [LazyUser.from_dict(d, channel._state) for d in channel._raw_members]
+    channel._raw_members = []
+    return members
+
+
+class LazyChannel(Channel):
+    __slots__ = ("_raw_members", "_state")
+    _raw_members: List[Dict[str, Any]]
+    _state: Optional[State]
+
+    members = lazy(Channel, "members", _decode_members)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> Channel:
+        channel = cls.__new__(cls)
+        channel.id = int(data["id"])
+        channel.name = data["name"]
+        channel._raw_members = data.get("members", [])
+        channel._state = state
+        return channel
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        return _as_plain(Channel, self)
+
+
+class LazyMessage(Message):
+    __slots__ = ("_data", "_state")
+    _data: Dict[str, Any]
+    _state: Optional[State]
+
+    user = lazy(
+        Message,
+        "user",
+        lambda self: LazyUser.from_dict(self._data["user"], self._state),
+    )
+    channel = lazy(
+        Message,
+        "channel",
+        lambda self: LazyChannel.from_dict(self._data["channel"], self._state),
+    )
+    mentions = lazy(
+        Message,
+        "mentions",
+        lambda self: [
+            LazyUser.from_dict(d, self._state) for d in self._data["mentions"]
+        ],
+    )
+    embed = lazy(
+        Message,
+        "embed",
+        lambda self: (
+            Embed.from_dict(embed) if (embed := self._data.get("embed")) else None
+        ),
+    )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> Message:
+        message = cls.__new__(cls)
+        message.id = int(data["id"])
+        message.content = data.get("content", None)
+        message._data = data
+        message._state = state
+        return message
+
+    def materialize(self) -> None:
+        """
+        Decodes every field and drops the raw data, for messages that are
+        kept around, as the raw data is larger than the decoded message.
+        """
+        for f in fields(Message):
+            getattr(self, f.name)
+        self._data = {}
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        return _as_plain(Message, self)
+
+
+class LazyMemberEvent(MemberEvent):
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], state: Optional[State] = None
+    ) -> MemberEvent:
+        channel = LazyChannel.from_dict(data["channel"], state)
+        user = LazyUser.from_dict(data["user"], state)
+        return cls(channel=channel, user=user)
+
+    def __reduce__(self) -> Tuple[Any, Tuple[Any, ...]]:
+        return _as_plain(MemberEvent, self)
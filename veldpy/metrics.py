@@ -0,0 +1,184 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import time
+
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+# A small, dependency free metrics registry.
+# Counters and histograms are updated by the client as events come in,
+# gauges are read when exporting. Samples can be exported in the
+# Prometheus text format or pushed to callbacks as they are recorded.
+
+Labels = Tuple[Tuple[str, str], ...]
+Sink = Callable[[str, Dict[str, str], float], Any]
+
+# In seconds, from 100µs to 10s
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        # The last slot counts values above the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+        Values above the largest bucket are reported as that bucket.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """buckets are the upper bounds of the histogram buckets in seconds."""
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._sinks: List[Sink] = []
+
+    def add_sink(self, sink: Sink) -> None:
+        """
+        Adds a callback that gets every sample as (name, labels, value)
+        when it is recorded, e.g. to forward it to statsd.
+        """
+        self._sinks.append(sink)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Increments a counter."""
+        key = tuple(labels.items())
+        series = self._counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+        for sink in self._sinks:
+            sink(name, labels, value)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Records a value in a histogram."""
+        key = tuple(labels.items())
+        series = self._histograms.setdefault(name, {})
+        if (histogram := series.get(key)) is None:
+            histogram = series[key] = Histogram(self.buckets)
+        histogram.observe(value)
+        for sink in self._sinks:
+            sink(name, labels, value)
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Registers a gauge, read is called whenever metrics are exported."""
+        self._gauges[name] = read
+
+    def get_counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(name, {}).get(tuple(labels.items()), 0)
+
+    def get_histogram(self, name: str, **labels: str) -> Histogram:
+        series = self._histograms.get(name, {})
+        return series.get(tuple(labels.items()), Histogram(self.buckets))
+
+    def read_gauges(self) -> Dict[str, float]:
+        return {name: read() for name, read in self._gauges.items()}
+
+    async def time(self, name: str, awaitable: Awaitable[Any], **labels: str) -> Any:
+        """Awaits something and records how long it took in a histogram."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, counters in self._counters.items():
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in counters.items():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name, histograms in self._histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = _format_labels(labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = _format_labels(labels, 'le="+Inf"')
+                lines.append(f"{name}_bucket{le} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for name, value in self.read_gauges().items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
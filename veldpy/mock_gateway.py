@@ -0,0 +1,271 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import socketio
+
+from aiohttp import web
+
+# A local stand-in for the veldchat gateway to load test bots against.
+# It sends a ready payload with a configurable number of members, creates
+# some channels and then emits a steady stream of events to every logged in
+# client. The REST routes used by HTTPClient are served as well, messages
+# sent through them are broadcast like on the real server.
+#
+#     python -m veldpy.mock_gateway --port 8080 --members 10000 --rate 1000
+#
+# and point the client at it:
+#
+#     Client(gateway_url="http://localhost:8080")
+
+log = logging.getLogger(__name__)
+
+
+class MockGateway:
+    def __init__(
+        self,
+        members: int = 1000,
+        channels: int = 10,
+        rate: float = 100.0,
+        ratelimit: Optional[int] = None,
+        seed: int = 0,
+    ) -> None:
+        """
+        rate is how many events per second every client receives.
+        ratelimit is how many requests per second a route allows
+        before the server answers with 429, None disables it.
+        """
+        self.members = members
+        self.channels = channels
+        self.rate = rate
+        self.ratelimit = ratelimit
+        self.random = random.Random(seed)
+        self.sio = socketio.AsyncServer(async_mode="aiohttp")
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        self.sio.on("login", self.on_login)
+        self.sio.on("disconnect", self.on_disconnect)
+        self.app.router.add_post("/api/v1/channels", self.create_channel)
+        self.app.router.add_post("/api/v1/channels/{id}/join", self.join_channel)
+        self.app.router.add_post("/api/v1/channels/{id}/messages", self.send_message)
+        self.messages_received = 0
+        self.events_sent = 0
+        self._emitters: Dict[str, "asyncio.Task[None]"] = {}
+        self._sessions: Set[str] = set()
+        # route -> (window start, requests in window)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._next_id = 1_000_000
+        self._runner: Optional[web.AppRunner] = None
+
+    def user(self, id: int) -> Dict[str, Any]:
+        return {
+            "id": id,
+            "name": f"user{id}",
+            "bot": id % 10 == 0,
+            "status": {"value": "online" if id % 3 else "away"},
+            "avatarUrl": f"https://cdn.veld.dev/avatars/{id}.png",
+        }
+
+    def channel(self, id: int, with_members: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"id": id, "name": f"channel{id}"}
+        if with_members:
+            data["members"] = [self.user(i) for i in range(1, self.members + 1)]
+        return data
+
+    def make_event(self, i: int) -> Tuple[str, Dict[str, Any]]:
+        """Returns the i-th event of the stream, mostly messages."""
+        user = self.user(self.random.randint(1, self.members))
+        channel = self.channel(self.random.randint(1, self.channels))
+        if i % 50 == 0:
+            return "member:create", {"channel": channel, "user": user}
+        if i % 50 == 25:
+            return "member:delete", {"channel": channel, "user": user}
+        if i % 10 == 5:
+            return "user:typing", user
+        message: Dict[str, Any] = {
+            "id": i,
+            "content": f"message {i}",
+            "user": user,
+            "channel": channel,
+            "mentions": [],
+        }
+        if i % 8 == 0:
+            message["embed"] = {"title": "title", "description": "description"}
+        return "message:create", message
+
+    async def on_login(self, sid: str, data: Dict[str, Any]) -> None:
+        log.info(f"{sid} logged in, bot={data.get('bot')}")
+        await self.sio.emit(
+            "ready",
+            {
+                "user": self.user(0),
+                "members": [self.user(i) for i in range(1, self.members + 1)],
+                "token": data.get("token") or "token",
+            },
+            room=sid,
+        )
+        for id in range(1, self.channels + 1):
+            await self.sio.emit("channel:create", self.channel(id, True), room=sid)
+        self._sessions.add(sid)
+        if self.rate > 0 and sid not in self._emitters:
+            self._emitters[sid] = asyncio.ensure_future(self._emit(sid))
+
+    async def on_disconnect(self, sid: str) -> None:
+        self._sessions.discard(sid)
+        if (emitter := self._emitters.pop(sid, None)) is not None:
+            emitter.cancel()
+
+    async def _emit(self, sid: str) -> None:
+        # Sends events in small batches to keep the rate steady
+        tick = 0.01
+        start = time.monotonic()
+        sent = 0
+        while True:
+            due = int((time.monotonic() - start) * self.rate)
+            while sent < due:
+                event, data = self.make_event(sent)
+                await self.sio.emit(event, data, room=sid)
+                sent += 1
+                self.events_sent += 1
+            await asyncio.sleep(tick)
+
+    def _ratelimit(self, request: web.Request) -> Dict[str, str]:
+        """
+        Counts a request against its route and returns the ratelimit headers.
+        Raises 429 once the route is exhausted.
+        """
+        if self.ratelimit is None:
+            return {}
+        now = time.monotonic()
+        window, count = self._windows.get(request.path, (now, 0))
+        if now - window >= 1:
+            window, count = now, 0
+        count += 1
+        self._windows[request.path] = (window, count)
+        reset_after = f"{1 - (now - window):.3f}"
+        headers = {
+            "X-RateLimit-Remaining": str(max(0, self.ratelimit - count)),
+            "X-RateLimit-Reset-After": reset_after,
+        }
+        if count > self.ratelimit:
+            raise web.HTTPTooManyRequests(
+                headers={**headers, "Retry-After": reset_after}
+            )
+        return headers
+
+    async def create_channel(self, request: web.Request) -> web.Response:
+        headers = self._ratelimit(request)
+        data = await request.json()
+        self._next_id += 1
+        channel = {"id": self._next_id, "name": data["name"], "members": []}
+        return web.json_response(channel, headers=headers)
+
+    async def join_channel(self, request: web.Request) -> web.Response:
+        headers = self._ratelimit(request)
+        return web.Response(status=204, headers=headers)
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        headers = self._ratelimit(request)
+        data = await request.json()
+        self.messages_received += 1
+        self._next_id += 1
+        message = {
+            "id": self._next_id,
+            "content": data.get("content"),
+            "embed": data.get("embed"),
+            "user": self.user(0),
+            "channel": self.channel(int(request.match_info["id"])),
+            "mentions": [],
+        }
+        await self.sio.emit("message:create", message)
+        return web.Response(status=204, headers=headers)
+
+    async def start(self, host: str = "localhost", port: int = 8080) -> None:
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        log.info(f"Mock gateway listening on http://{host}:{port}")
+
+    async def stop(self) -> None:
+        for emitter in self._emitters.values():
+            emitter.cancel()
+        self._emitters.clear()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(gateway: MockGateway, host: str, port: int) -> None:
+    await gateway.start(host, port)
+    try:
+        while True:
+            sent = gateway.events_sent
+            await asyncio.sleep(5)
+            log.info(
+                f"{len(gateway._sessions)} clients, "
+                f"{(gateway.events_sent - sent) / 5:.0f} events/s sent, "
+                f"{gateway.messages_received} messages received"
+            )
+    finally:
+        await gateway.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local mock veldchat gateway")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=100.0, help="events/s")
+    parser.add_argument("--ratelimit", type=int, help="requests/s per route")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    gateway = MockGateway(
+        members=args.members,
+        channels=args.channels,
+        rate=args.rate,
+        ratelimit=args.ratelimit,
+        seed=args.seed,
+    )
+    try:
+        asyncio.run(_serve(gateway, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
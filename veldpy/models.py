@@ -29,13 +29,36 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type, TypeVar, cast
+
+if TYPE_CHECKING:
+    from .state import State
 
 # This is an implementation of the veldchat gateway models as described here:
 # https://github.com/velddev/node-chat-server/wiki/Model
 
+T = TypeVar("T")
+
+
+def slotted(cls: Type[T]) -> Type[T]:
+    """
+    Recreates a dataclass with __slots__ for its fields.
+    This is what dataclass(slots=True) does on Python 3.10+.
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cast(Any, cls)))
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        # Remove the defaults, they would shadow the slot descriptors
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    new_cls = type(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return cast(Type[T], new_cls)
+
 
 class Status(Enum):
     ONLINE = "online"
@@ -44,6 +67,7 @@ class Status(Enum):
     AWAY = "away"
 
 
+@slotted
 @dataclass
 class Embed:
     author: Optional[EmbedAuthor] = None
@@ -90,6 +114,7 @@ class Embed:
         }
 
 
+@slotted
 @dataclass
 class EmbedAuthor:
     value: str
@@ -105,6 +130,7 @@ class EmbedAuthor:
         return {"value": self.value, "iconUrl": self.icon_url}
 
 
+@slotted
 @dataclass
 class Message:
     id: int
@@ -115,11 +141,11 @@ class Message:
     embed: Optional[Embed] = None
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> Message:
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> Message:
         id = int(data["id"])
-        user = data["user"]
-        channel = data["channel"]
-        mentions = data["mentions"]
+        user = User.from_dict(data["user"], state)
+        channel = Channel.from_dict(data["channel"], state)
+        mentions = [User.from_dict(d, state) for d in data["mentions"]]
         content = data.get("content", None)
         if embed := data.get("embed", None):
             embed = Embed.from_dict(embed)
@@ -133,6 +159,7 @@ class Message:
         )
 
 
+@slotted
 @dataclass
 class User:
     # compare needs to be False for id to be used for comparison
@@ -143,15 +170,32 @@ class User:
     avatar_url: Optional[str] = field(default=None, compare=False)
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> User:
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> User:
+        """
+        Parses a user.
+        If a state is passed, the user cached there is updated and returned.
+        """
         id = int(data["id"])
+        if state is not None and (user := state.get_user(id)) is not None:
+            user._update(data)
+            return user
         name = data["name"]
         bot = data["bot"]
         status = UserStatus.from_dict(data["status"])
         avatar_url = data.get("avatarUrl", None)
-        return cls(id=id, name=name, bot=bot, status=status, avatar_url=avatar_url)
+        user = cls(id=id, name=name, bot=bot, status=status, avatar_url=avatar_url)
+        if state is not None:
+            state.store_user(user)
+        return user
+
+    def _update(self, data: Dict[str, Any]) -> None:
+        self.name = data["name"]
+        self.bot = data["bot"]
+        self.status._update(data["status"])
+        self.avatar_url = data.get("avatarUrl", None)
 
 
+@slotted
 @dataclass
 class ReadyPayload:
     user: User
@@ -159,13 +203,16 @@ class ReadyPayload:
     token: str
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> ReadyPayload:
-        user = User.from_dict(data["user"])
-        members = [User.from_dict(d) for d in data["members"]]
+    def from_dict(
+        cls, data: Dict[str, Any], state: Optional[State] = None
+    ) -> ReadyPayload:
+        user = User.from_dict(data["user"], state)
+        members = [User.from_dict(d, state) for d in data["members"]]
         token = data["token"]
         return cls(user=user, members=members, token=token)
 
 
+@slotted
 @dataclass
 class TokenResponse:
     id: int
@@ -178,6 +225,7 @@ class TokenResponse:
         return cls(id=id, token=token)
 
 
+@slotted
 @dataclass
 class Emoji:
     name: str
@@ -192,6 +240,7 @@ class Emoji:
         return cls(name=name, value=value, image=image)
 
 
+@slotted
 @dataclass
 class UserStatus:
     value: Status
@@ -203,7 +252,12 @@ class UserStatus:
         status_text = data.get("statusText", None)
         return cls(value=value, status_text=status_text)
 
+    def _update(self, data: Dict[str, Any]) -> None:
+        self.value = Status[data["value"].upper()]
+        self.status_text = data.get("statusText", None)
+
 
+@slotted
 @dataclass
 class Channel:
     id: int
@@ -211,20 +265,23 @@ class Channel:
     members: List[User] = field(default_factory=lambda: [], compare=False)
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> Channel:
+    def from_dict(cls, data: Dict[str, Any], state: Optional[State] = None) -> Channel:
         id = int(data["id"])
         name = data["name"]
-        members = [User.from_dict(d) for d in data.get("members", [])]
+        members = [User.from_dict(d, state) for d in data.get("members", [])]
         return cls(id=id, name=name, members=members)
 
 
+@slotted
 @dataclass
 class MemberEvent:
     channel: Channel
     user: User
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> MemberEvent:
-        channel = Channel.from_dict(data["channel"])
-        user = User.from_dict(data["user"])
+    def from_dict(
+        cls, data: Dict[str, Any], state: Optional[State] = None
+    ) -> MemberEvent:
+        channel = Channel.from_dict(data["channel"], state)
+        user = User.from_dict(data["user"], state)
         return cls(channel=channel, user=user)
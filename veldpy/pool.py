@@ -0,0 +1,139 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import logging
+
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+import aiohttp
+
+from .client import GATEWAY_URL, Client
+from .codec import JSONCodec, get_codec
+from .columns import MemberStore, UserColumns
+from .http import HTTPClient
+
+# Runs many accounts in one process and event loop.
+# Every account still needs its own gateway connection, token, ratelimits
+# and cache of the channels it is in. What the accounts share is the JSON
+# codec, one HTTP connection pool and, if passed, the columns of a member
+# store, since a user is the same no matter who looks at it. Which channels
+# and members an account sees is still kept per account.
+
+log = logging.getLogger(__name__)
+
+
+class ClientPool:
+    def __init__(
+        self,
+        codec: Union[str, JSONCodec, None] = None,
+        gateway_url: str = GATEWAY_URL,
+        limit: int = 100,
+        keepalive_timeout: float = 30.0,
+        member_columns: Optional[UserColumns] = None,
+        **client_options: Any,
+    ) -> None:
+        """
+        limit bounds the connections of all accounts together, 0 means no
+        limit. member_columns makes every client use a member store with
+        these shared users. client_options are passed to every Client,
+        e.g. lazy_models or max_cached_users.
+        """
+        self.codec = get_codec(codec)
+        self.gateway_url = gateway_url
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.member_columns = member_columns
+        self.client_options = client_options
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self._accounts: List[Tuple[Client, str, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __iter__(self) -> Iterator[Client]:
+        return (client for client, _, _ in self._accounts)
+
+    def add(self, token: str, bot: bool = True, **options: Any) -> Client:
+        """
+        Creates the client of an account, options override the ones of
+        the pool. Register listeners on it before the pool is started.
+        """
+        options = {**self.client_options, **options}
+        if self.member_columns is not None and "member_store" not in options:
+            options["member_store"] = MemberStore(self.member_columns)
+        http = HTTPClient(
+            codec=self.codec,
+            base_url=f"{self.gateway_url.rstrip('/')}/api/v1",
+            metrics=options.get("metrics"),
+            connector=self.connector,
+        )
+        client = Client(
+            codec=self.codec,
+            http=http,
+            gateway_url=self.gateway_url,
+            **options,
+        )
+        self._accounts.append((client, token, bot))
+        return client
+
+    async def start(self) -> None:
+        """Starts all accounts and waits until they are disconnected."""
+        if self.connector is None:
+            # Created here, a connector belongs to the running event loop
+            self.connector = aiohttp.TCPConnector(
+                limit=self.limit, keepalive_timeout=self.keepalive_timeout
+            )
+        for client in self:
+            client.http.connector = self.connector
+        log.info(f"Starting {len(self)} clients")
+        await asyncio.gather(
+            *(client.start(token, bot) for client, token, bot in self._accounts)
+        )
+
+    def run(self) -> None:
+        """Starts a new event loop in asyncio and runs all accounts forever."""
+        loop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(self.start())
+        except KeyboardInterrupt:
+            pass
+        except Exception:
+            import traceback
+
+            traceback.print_exc()
+        finally:
+            loop.run_until_complete(self.close())
+
+    async def close(self) -> None:
+        """Closes all clients and the shared connection pool."""
+        await asyncio.gather(*(client.close() for client in self))
+        if self.connector is not None:
+            await self.connector.close()
+            self.connector = None
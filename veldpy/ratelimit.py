@@ -0,0 +1,158 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+import random
+import time
+
+from typing import Dict, Mapping, Optional
+
+# Ratelimits are tracked per bucket, which is a route and its major parameter
+# (the channel). Requests in a bucket are released in the order they arrive
+# and wait for the bucket to reset once the gateway reports it as exhausted.
+
+
+class RateLimitBucket:
+    __slots__ = ("key", "remaining", "reset_at", "waiting", "_lock")
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        # None means the limit is unknown and requests are not held back
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.waiting = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Waits until a request may be sent in this bucket."""
+        self.waiting += 1
+        try:
+            async with self._lock:
+                if self.remaining is not None and self.remaining <= 0:
+                    delay = self.reset_at - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    self.remaining = None
+                if self.remaining is not None:
+                    self.remaining -= 1
+        finally:
+            self.waiting -= 1
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Updates the bucket from the ratelimit headers of a response."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        reset_at = self.reset_at
+        try:
+            count = int(remaining)
+            if (reset_after := headers.get("X-RateLimit-Reset-After")) is not None:
+                reset_at = time.monotonic() + float(reset_after)
+            elif (reset := headers.get("X-RateLimit-Reset")) is not None:
+                reset_at = time.monotonic() + float(reset) - time.time()
+        except ValueError:
+            # Malformed headers are ignored as if they were missing
+            return
+        self.remaining = count
+        self.reset_at = reset_at
+
+    def block(self, seconds: float) -> None:
+        """Holds back all requests in this bucket for some time."""
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_buckets: int = 1000,
+    ) -> None:
+        """
+        max_retries is how often a request is retried after it was
+        ratelimited or failed with a server error.
+        backoff is the initial delay before a retry, it doubles
+        with every attempt up to max_backoff.
+        Once there are more than max_buckets buckets, the idle ones are
+        dropped.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_buckets = max_buckets
+        self._prune_at = max_buckets
+        self._buckets: Dict[str, RateLimitBucket] = {}
+
+    def get_bucket(self, key: str) -> RateLimitBucket:
+        if (bucket := self._buckets.get(key)) is None:
+            if len(self._buckets) >= self._prune_at:
+                self._prune()
+            bucket = self._buckets[key] = RateLimitBucket(key)
+        return bucket
+
+    def _prune(self) -> None:
+        # Buckets with no waiters and an expired limit carry no information,
+        # a new bucket for the same key behaves the same
+        now = time.monotonic()
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket.waiting or bucket.reset_at > now
+        }
+        # Do not prune on every new bucket if most of them are busy
+        self._prune_at = max(self.max_buckets, 2 * len(self._buckets))
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting in any bucket."""
+        return sum(bucket.waiting for bucket in self._buckets.values())
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Number of requests waiting per bucket, for buckets with a queue."""
+        return {
+            key: bucket.waiting
+            for key, bucket in self._buckets.items()
+            if bucket.waiting
+        }
+
+    def retry_delay(self, attempt: int, headers: Mapping[str, str]) -> float:
+        """
+        Returns how long to wait before retrying a request.
+        Retry-After is honoured, otherwise an exponential backoff with jitter
+        is used.
+        """
+        if (retry_after := headers.get("Retry-After")) is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        delay = min(self.max_backoff, self.backoff * 2.0 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,337 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+
+from multiprocessing.connection import Connection, wait
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+from .events import GatewayEvent
+from .models import Channel, User
+
+if TYPE_CHECKING:
+    from .client import Client
+
+# The gateway has no notion of shards, every process logs in and receives
+# all events. A shard only dispatches the events of the channels it owns,
+# (channel id modulo the shard count), so the parsing and listener work is
+# spread over all processes.
+# The supervisor starts one process per shard, restarts crashed ones and
+# routes requests between shards over pipes.
+
+log = logging.getLogger(__name__)
+
+ClientFactory = Callable[[int, int], "Client"]
+
+_CHANNEL_EVENTS = (GatewayEvent.CHANNEL_CREATE, GatewayEvent.CHANNEL_DELETE)
+
+
+def shard_for(event: GatewayEvent, data: Dict[str, Any], shard_count: int) -> int:
+    """
+    Returns the shard that handles an event, -1 if every shard does.
+    Typing events have no channel and are sharded by user instead.
+    """
+    if event is GatewayEvent.READY:
+        return -1
+    if event in _CHANNEL_EVENTS or event is GatewayEvent.MEMBER_TYPING:
+        key = int(data["id"])
+    else:
+        key = int(data["channel"]["id"])
+    return key % shard_count
+
+
+class ShardError(Exception):
+    """Raised when a request to another shard failed."""
+
+    pass
+
+
+class ShardLink:
+    def __init__(
+        self, client: Client, conn: Connection, shard_id: int, shard_count: int
+    ) -> None:
+        """
+        The end of the IPC channel inside a shard process.
+        Other shards can call the handlers registered here.
+        """
+        self.client = client
+        self.conn = conn
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.handlers: Dict[str, Callable[..., Any]] = {
+            "get_channel": self._get_channel,
+            "get_user": self._get_user,
+        }
+        self._ids = itertools.count()
+        self._pending: Dict[int, asyncio.Future[Any]] = {}
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        loop.add_reader(self.conn.fileno(), self._receive)
+
+    def owner(self, channel_id: int) -> int:
+        """Returns the shard that owns a channel."""
+        return channel_id % self.shard_count
+
+    def handler(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator that makes a function callable from other shards."""
+
+        def inner(func: Callable[..., Any]) -> Callable[..., Any]:
+            self.handlers[name] = func
+            return func
+
+        return inner
+
+    async def request(
+        self, shard_id: int, name: str, *args: Any, timeout: float = 5.0
+    ) -> Any:
+        """Calls a handler on another shard and returns its result."""
+        if shard_id == self.shard_id:
+            return await self._call(name, args)
+        request_id = next(self._ids)
+        future = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self.conn.send(("request", self.shard_id, shard_id, request_id, name, args))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def get_channel(self, channel_id: int) -> Optional[Channel]:
+        """Looks up a channel in the cache of the shard that owns it."""
+        channel = await self.request(self.owner(channel_id), "get_channel", channel_id)
+        return cast(Optional[Channel], channel)
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        """Looks up a user in the caches of all shards."""
+        for shard_id in range(self.shard_count):
+            if (user := await self.request(shard_id, "get_user", user_id)) is not None:
+                return cast(User, user)
+        return None
+
+    def _get_channel(self, channel_id: int) -> Optional[Channel]:
+        if (channel := self.client.get_channel(channel_id)) is None:
+            return None
+        # A plain copy, lazy channels reference the whole state
+        return Channel(id=channel.id, name=channel.name, members=list(channel.members))
+
+    def _get_user(self, user_id: int) -> Optional[User]:
+        return self.client.get_user(user_id)
+
+    async def _call(self, name: str, args: Tuple[Any, ...]) -> Any:
+        if (handler := self.handlers.get(name)) is None:
+            raise ShardError(f"Shard {self.shard_id} has no handler {name!r}")
+        result = handler(*args)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    async def _respond(
+        self, source: int, request_id: int, name: str, args: Tuple[Any, ...]
+    ) -> None:
+        try:
+            result = await self._call(name, args)
+        except Exception as e:
+            message = ("response", self.shard_id, source, request_id, False, repr(e))
+        else:
+            message = ("response", self.shard_id, source, request_id, True, result)
+        self.conn.send(message)
+
+    def _receive(self) -> None:
+        try:
+            while self.conn.poll():
+                kind, source, _, request_id, *rest = self.conn.recv()
+                if kind == "request":
+                    name, args = rest
+                    asyncio.ensure_future(self._respond(source, request_id, name, args))
+                elif (future := self._pending.get(request_id)) is not None:
+                    ok, value = rest
+                    if future.done():
+                        continue
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(ShardError(value))
+        except EOFError:
+            # The supervisor is gone
+            asyncio.get_event_loop().remove_reader(self.conn.fileno())
+
+
+def _run_shard(
+    factory: ClientFactory,
+    shard_id: int,
+    shard_count: int,
+    conn: Connection,
+    token: Optional[str],
+    bot: bool,
+) -> None:
+    client = factory(shard_id, shard_count)
+    client.shard_id = shard_id
+    client.shard_count = shard_count
+    client.shards = ShardLink(client, conn, shard_id, shard_count)
+    client.shards.attach(asyncio.get_event_loop())
+    client.run(token=token, bot=bot)
+
+
+class ShardSupervisor:
+    def __init__(
+        self,
+        factory: ClientFactory,
+        shard_count: Optional[int] = None,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+    ) -> None:
+        """
+        factory creates the client of a shard from its id and the shard
+        count. It runs in the shard process and has to be picklable,
+        i.e. a module level function.
+        shard_count defaults to the number of CPUs.
+        Crashed shards are restarted after restart_delay, which doubles
+        for every crash in a row up to max_restart_delay.
+        """
+        self.factory = factory
+        self.shard_count = shard_count or os.cpu_count() or 1
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self._conns: Dict[int, Connection] = {}
+        self._crashes: Dict[int, int] = {}
+        self._started_at: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._running = False
+
+    def _start(self, shard_id: int, token: Optional[str], bot: bool) -> None:
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_shard,
+            args=(self.factory, shard_id, self.shard_count, child, token, bot),
+            name=f"veldpy-shard-{shard_id}",
+        )
+        process.start()
+        child.close()
+        self._processes[shard_id] = process
+        self._conns[shard_id] = parent
+        self._started_at[shard_id] = time.monotonic()
+        log.info(f"Started shard {shard_id} (pid {process.pid})")
+
+    def _stopped(self, shard_id: int) -> None:
+        process = self._processes.pop(shard_id)
+        self._conns.pop(shard_id).close()
+        if not self._running:
+            return
+        crashes = self._crashes.get(shard_id, 0)
+        if time.monotonic() - self._started_at[shard_id] > self.max_restart_delay:
+            # It ran fine for a while, this is not a crash loop
+            crashes = 0
+        delay = min(self.max_restart_delay, self.restart_delay * 2 ** crashes)
+        self._crashes[shard_id] = crashes + 1
+        log.warning(
+            f"Shard {shard_id} exited with {process.exitcode}, restarting in {delay}s"
+        )
+        self._restart_at[shard_id] = time.monotonic() + delay
+
+    def _route(self, message: Tuple[Any, ...]) -> None:
+        kind, source, target, request_id, *_ = message
+        if (conn := self._conns.get(target)) is not None:
+            try:
+                conn.send(message)
+                return
+            except OSError:
+                pass
+        if kind == "request" and (conn := self._conns.get(source)) is not None:
+            error = f"Shard {target} is unavailable"
+            conn.send(("response", target, source, request_id, False, error))
+
+    def run(self, token: Optional[str] = None, bot: bool = True) -> None:
+        """Starts all shards and supervises them until interrupted."""
+        self._running = True
+        for shard_id in range(self.shard_count):
+            self._start(shard_id, token, bot)
+        try:
+            while self._running:
+                sentinels = {p.sentinel: i for i, p in self._processes.items()}
+                objects: List[Union[Connection, int]] = [
+                    *self._conns.values(),
+                    *sentinels,
+                ]
+                timeout = 1.0
+                if self._restart_at:
+                    next_restart = min(self._restart_at.values()) - time.monotonic()
+                    timeout = max(0.0, min(timeout, next_restart))
+                for ready in wait(objects, timeout=timeout):
+                    if isinstance(ready, Connection):
+                        try:
+                            self._route(ready.recv())
+                        except (EOFError, OSError):
+                            pass
+                for sentinel, shard_id in sentinels.items():
+                    if not self._processes[shard_id].is_alive():
+                        self._stopped(shard_id)
+                now = time.monotonic()
+                for shard_id, at in list(self._restart_at.items()):
+                    if at <= now:
+                        del self._restart_at[shard_id]
+                        self._start(shard_id, token, bot)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._running = False
+            self._shutdown()
+
+    def stop(self) -> None:
+        """Makes run terminate all shards and return. Safe to call from any thread."""
+        self._running = False
+
+    def _shutdown(self) -> None:
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(5)
+        for conn in self._conns.values():
+            conn.close()
+        self._processes.clear()
+        self._conns.clear()
+        self._restart_at.clear()
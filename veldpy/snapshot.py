@@ -0,0 +1,204 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import os
+import struct
+
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .columns import MemberStore
+from .models import Channel, Status, User, UserStatus
+from .state import State
+
+# A compact binary snapshot of the cached channels and users.
+# It is written when the client closes and read back in full on the next
+# start, so the cache is warm before the gateway sent anything.
+#
+# Layout, all integers little endian:
+#   header   magic "VELD", u16 version, u32 user count, u32 channel count
+#   user     i64 id, u8 flags (1 = bot), u8 status, then the name,
+#            avatar url and status text as strings
+#   channel  i64 id, u32 member count, the name as string, i64 member ids
+# Strings are a u32 byte length followed by UTF-8, 0xFFFFFFFF is None.
+
+MAGIC = b"VELD"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHII")
+_USER = struct.Struct("<qBB")
+_CHANNEL = struct.Struct("<qI")
+_LENGTH = struct.Struct("<I")
+_NONE = 0xFFFFFFFF
+_STATUSES = list(Status)
+_STATUS_INDEX = {status: i for i, status in enumerate(_STATUSES)}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is corrupt or from another version."""
+
+    pass
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    if value is None:
+        return _LENGTH.pack(_NONE)
+    encoded = value.encode()
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def _unpack_str(data: bytes, offset: int) -> Tuple[Optional[str], int]:
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    if length == _NONE:
+        return None, offset
+    end = offset + length
+    if end > len(data):
+        raise SnapshotError("Truncated string")
+    return data[offset:end].decode(), end
+
+
+def dump(
+    users: Iterable[User],
+    channels: Iterable[Channel],
+    members: Optional[Mapping[int, List[int]]] = None,
+) -> bytes:
+    """members are the member IDs by channel ID if not the channels' members."""
+    users = list(users)
+    channels = list(channels)
+    parts = [_HEADER.pack(MAGIC, VERSION, len(users), len(channels))]
+    for user in users:
+        status = user.status
+        parts.append(_USER.pack(user.id, int(user.bot), _STATUS_INDEX[status.value]))
+        parts.append(_pack_str(user.name))
+        parts.append(_pack_str(user.avatar_url))
+        parts.append(_pack_str(status.status_text))
+    for channel in channels:
+        if members is not None:
+            ids = members.get(channel.id, [])
+        else:
+            ids = [user.id for user in channel.members]
+        parts.append(_CHANNEL.pack(channel.id, len(ids)))
+        parts.append(_pack_str(channel.name))
+        parts.append(struct.pack(f"<{len(ids)}q", *ids))
+    return b"".join(parts)
+
+
+def save_snapshot(
+    state: State, path: str, member_store: Optional[MemberStore] = None
+) -> None:
+    """
+    Writes the cache of a state to a file, replacing it atomically.
+    With a member store the channel members are taken from it.
+    """
+    users = state.users
+    members: Optional[Dict[int, List[int]]] = None
+    if member_store is not None:
+        members = {
+            channel.id: member_store.query(channel.id) for channel in state.channels
+        }
+        known = {user.id for user in users}
+        for ids in members.values():
+            for id in ids:
+                if id in known:
+                    continue
+                known.add(id)
+                if (user := member_store.get_user(id)) is not None:
+                    users.append(user)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dump(users, state.channels, members))
+    os.replace(tmp, path)
+
+
+def _parse(data: bytes) -> Tuple[List[User], List[Tuple[Channel, List[int]]]]:
+    try:
+        magic, version, user_count, channel_count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"Not a version {VERSION} snapshot")
+        offset = _HEADER.size
+        users = []
+        for _ in range(user_count):
+            id, flags, status = _USER.unpack_from(data, offset)
+            offset += _USER.size
+            name, offset = _unpack_str(data, offset)
+            avatar_url, offset = _unpack_str(data, offset)
+            status_text, offset = _unpack_str(data, offset)
+            users.append(
+                User(
+                    id=id,
+                    name=name,  # type: ignore
+                    bot=bool(flags & 1),
+                    status=UserStatus(_STATUSES[status], status_text),
+                    avatar_url=avatar_url,
+                )
+            )
+        channels = []
+        for _ in range(channel_count):
+            id, member_count = _CHANNEL.unpack_from(data, offset)
+            offset += _CHANNEL.size
+            name, offset = _unpack_str(data, offset)
+            member_ids = list(struct.unpack_from(f"<{member_count}q", data, offset))
+            offset += 8 * member_count
+            channels.append((Channel(id=id, name=name), member_ids))  # type: ignore
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+    return users, channels
+
+
+def load_snapshot(
+    state: State, path: str, member_store: Optional[MemberStore] = None
+) -> bool:
+    """
+    Fills a state from a snapshot file, and the channel members into the
+    member store if one is passed.
+    Returns False if there is none, raises SnapshotError if it is unusable.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return False
+    with f:
+        data = f.read()
+    if not data:
+        raise SnapshotError("Empty snapshot")
+    users, channels = _parse(data)
+    # Channels first, their members are pinned and can't be evicted
+    by_id = {user.id: user for user in users}
+    for channel, member_ids in channels:
+        members = [by_id[id] for id in member_ids if id in by_id]
+        if member_store is not None:
+            for user in members:
+                member_store.add_member(channel.id, user)
+        else:
+            channel.members = members
+        state.add_channel(channel)
+    if member_store is not None:
+        users = [user for user in users if user.id not in member_store]
+    state.store_users(users)
+    return True
@@ -0,0 +1,207 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from .models import Channel, User
+
+# The state keeps every entity the client knows about indexed by id
+# so that the built-in event handlers never have to scan lists.
+# Users are interned: there is exactly one User object per id and events
+# referencing a known user update that object in place.
+
+
+class State:
+    def __init__(self, max_users: Optional[int] = 10_000) -> None:
+        """
+        max_users bounds how many users that are not a member of any
+        cached channel are kept around, least recently used ones are
+        evicted first. None disables eviction.
+        """
+        self.max_users = max_users
+        self._channels: Dict[int, Channel] = {}
+        # users that are referenced by a cached channel or pinned otherwise
+        self._users: Dict[int, User] = {}
+        self._user_refs: Dict[int, int] = {}
+        # everyone else, in least recently used order
+        self._recent_users: "OrderedDict[int, User]" = OrderedDict()
+        # channel id -> user id -> index of the user in channel.members
+        self._members: Dict[int, Dict[int, int]] = {}
+
+    def clear(self) -> None:
+        """Drops everything that is cached."""
+        self._channels.clear()
+        self._users.clear()
+        self._user_refs.clear()
+        self._recent_users.clear()
+        self._members.clear()
+
+    @property
+    def channels(self) -> List[Channel]:
+        return list(self._channels.values())
+
+    @property
+    def users(self) -> List[User]:
+        return [*self._users.values(), *self._recent_users.values()]
+
+    @property
+    def user_count(self) -> int:
+        return len(self._users) + len(self._recent_users)
+
+    def get_channel(self, channel_id: int) -> Optional[Channel]:
+        return self._channels.get(channel_id)
+
+    def get_user(self, user_id: int) -> Optional[User]:
+        if (user := self._users.get(user_id)) is not None:
+            return user
+        if (user := self._recent_users.get(user_id)) is not None:
+            self._recent_users.move_to_end(user_id)
+        return user
+
+    def get_member_ids(self, channel_id: int) -> Iterable[int]:
+        """Returns a view of the ids of all members in a channel."""
+        return self._members.get(channel_id, {}).keys()
+
+    def is_member(self, channel_id: int, user_id: int) -> bool:
+        return user_id in self._members.get(channel_id, ())
+
+    def store_user(self, user: User) -> User:
+        """
+        Caches a user and returns the canonical object for its id.
+        If another object with the same id is cached, it is updated instead.
+        """
+        cached = self.get_user(user.id)
+        if cached is None:
+            self._recent_users[user.id] = user
+            self._evict()
+            return user
+        if cached is not user:
+            cached.name = user.name
+            cached.bot = user.bot
+            cached.status = user.status
+            cached.avatar_url = user.avatar_url
+        return cached
+
+    def store_users(self, users: Iterable[User]) -> None:
+        for user in users:
+            self.store_user(user)
+
+    def pin_user(self, user: User) -> User:
+        """Keeps a user cached until it is unpinned as often as it was pinned."""
+        user = self.store_user(user)
+        refs = self._user_refs.get(user.id, 0)
+        if refs == 0:
+            self._recent_users.pop(user.id, None)
+            self._users[user.id] = user
+        self._user_refs[user.id] = refs + 1
+        return user
+
+    def unpin_user(self, user_id: int) -> None:
+        refs = self._user_refs.get(user_id, 0) - 1
+        if refs > 0:
+            self._user_refs[user_id] = refs
+            return
+        self._user_refs.pop(user_id, None)
+        if (user := self._users.pop(user_id, None)) is not None:
+            self._recent_users[user_id] = user
+            self._evict()
+
+    def _evict(self) -> None:
+        if self.max_users is None:
+            return
+        while len(self._recent_users) > self.max_users:
+            self._recent_users.popitem(last=False)
+
+    def add_channel(self, channel: Channel) -> Channel:
+        """
+        Caches a channel and indexes its members.
+        Duplicate members sent by the gateway are dropped.
+        """
+        self.remove_channel(channel.id)
+        members = channel.members
+        channel.members = []
+        self._channels[channel.id] = channel
+        self._members[channel.id] = {}
+        for user in members:
+            self.add_member(channel.id, user)
+        return channel
+
+    def remove_channel(self, channel_id: int) -> Optional[Channel]:
+        for user_id in self._members.pop(channel_id, ()):
+            self.unpin_user(user_id)
+        return self._channels.pop(channel_id, None)
+
+    def add_member(self, channel_id: int, user: User) -> bool:
+        """
+        Adds a user to a cached channel.
+        Returns False if the channel is unknown or the user already a member.
+        """
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            return False
+        index = self._members[channel_id]
+        if user.id in index:
+            return False
+        user = self.pin_user(user)
+        index[user.id] = len(channel.members)
+        channel.members.append(user)
+        return True
+
+    def remove_member(self, channel_id: int, user_id: int) -> Optional[User]:
+        """
+        Removes a user from a cached channel in constant time.
+        The last member takes the place of the removed one.
+        """
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            return None
+        index = self._members[channel_id]
+        position = index.pop(user_id, None)
+        if position is None:
+            return None
+        self.unpin_user(user_id)
+        members = channel.members
+        last = members.pop()
+        if position == len(members):
+            return last
+        removed = members[position]
+        members[position] = last
+        index[last.id] = position
+        return removed
+
+    def reconcile(self, members: Iterable[User]) -> None:
+        """
+        Removes channel members that are not in the member list of a ready
+        payload, they left while the cache was not kept up to date.
+        """
+        present = {user.id for user in members}
+        for channel_id, index in self._members.items():
+            for user_id in [id for id in index if id not in present]:
+                self.remove_member(channel_id, user_id)
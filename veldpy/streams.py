@@ -0,0 +1,104 @@
+"""
+Copyright (c) 2020, Jens Reidel
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+3. Neither the name of the copyright holder nor the names of its
+   contributors may be used to endorse or promote products derived from
+   this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+import asyncio
+
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+from .events import GatewayEvent
+
+# Async iterators over events.
+# Every stream has its own bounded queue that the client appends parsed
+# events to, so consuming them does not need a task per event.
+# When a consumer falls behind, the oldest events are dropped.
+
+Check = Callable[[Any], bool]
+
+
+class EventStream:
+    def __init__(
+        self,
+        event: GatewayEvent,
+        check: Optional[Check] = None,
+        maxsize: int = 100,
+        on_close: Optional[Callable[["EventStream"], Any]] = None,
+    ) -> None:
+        self.event = event
+        self.check = check
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._queue: Deque[Any] = deque()
+        self._waiter: Optional[asyncio.Future[None]] = None
+        self._on_close = on_close
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def feed(self, value: Any) -> None:
+        """Queues an event if it passes the check."""
+        if self.closed or (self.check is not None and not self.check(value)):
+            return
+        if len(self._queue) >= self.maxsize:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(value)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def close(self) -> None:
+        """Stops the stream, iteration ends once the queue is drained."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __aiter__(self) -> "EventStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        while not self._queue:
+            if self.closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_event_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._queue.popleft()
+
+    async def __aenter__(self) -> "EventStream":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()